@@ -0,0 +1,133 @@
+# Board analysis that survives between turns: cross-check masks and anchors are computed once
+# for the whole board and then patched for the few squares a play can affect.
+
+from collections.abc import Iterable
+
+from board import Board, CellCoord, Direction, Letter
+from lexicon import Dawg
+from scoring import TILE_SCORE
+from solver import ALL_LETTERS, cross_check_planes, letters_mask, mask_letters
+
+CENTER: CellCoord = (7, 7)
+
+
+def cross_deltas(direction: Direction) -> tuple[int, int]:
+    """Step along the words that cross a play made in `direction`."""
+    return (1, 0) if direction == Direction.ACROSS else (0, 1)
+
+
+class BoardAnalysis:
+    board: Board
+    cross_masks: dict[Direction, dict[CellCoord, int]]   # per play direction, letters allowed on each empty square
+    cross_scores: dict[Direction, dict[CellCoord, int]]  # per play direction, face value of the existing tiles in the
+                                                         # word crossing each empty square (only squares that have one)
+    anchors: set[CellCoord]
+    blanks: set[CellCoord]  # blanks on the board, in screen coordinates like `MyGame.blank_letters`
+    first_turn: bool
+
+    def __init__(self, dictionary: Dawg, board: Board, blanks: Iterable[CellCoord] = ()) -> None:
+        self.dictionary   = dictionary
+        self.board        = board
+        self.cross_masks  = {direction: {} for direction in Direction}
+        self.cross_scores = {direction: {} for direction in Direction}
+        self.anchors      = set()
+        self.blanks       = set(blanks)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Recomputes everything from scratch; only needed when the board is replaced wholesale."""
+        masks = cross_check_planes(self.dictionary, self.board).tolist()
+        for direction in Direction:
+            self.cross_masks[direction]  = {(row, col): masks[row][col][direction - 1] for row, col in self.board.all_positions()}
+            self.cross_scores[direction] = {}
+            for pos in self.board.all_positions():
+                self.update_cross_score(pos, direction)
+        self.first_turn = self.board.is_first_turn()
+        if self.first_turn:
+            self.anchors = {CENTER}
+        else:
+            self.anchors = set(self.board.anchors())
+
+    def copy(self, board: Board) -> "BoardAnalysis":
+        """An independent analysis of `board`, which must be a copy of this analysis' board."""
+        analysis              = BoardAnalysis.__new__(BoardAnalysis)
+        analysis.dictionary   = self.dictionary
+        analysis.board        = board
+        analysis.cross_masks  = {direction: masks.copy() for direction, masks in self.cross_masks.items()}
+        analysis.cross_scores = {direction: scores.copy() for direction, scores in self.cross_scores.items()}
+        analysis.anchors      = self.anchors.copy()
+        analysis.blanks       = self.blanks.copy()
+        analysis.first_turn   = self.first_turn
+        return analysis
+
+    def anchor_list(self) -> list[CellCoord]:
+        return sorted(self.anchors)
+
+    def hook_letters(self, rack: Iterable[Letter] | None = None) -> dict[CellCoord, set[Letter]]:
+        """Letters fitting each anchor in both directions, only those on `rack` when given, for the hook overlay."""
+        allowed      = ALL_LETTERS if rack is None else letters_mask(tile for tile in rack if tile != " ")
+        across, down = self.cross_masks[Direction.ACROSS], self.cross_masks[Direction.DOWN]
+        return {pos: mask_letters(across[pos] & down[pos] & allowed) for pos in self.anchors}
+
+    def cross_word(self, pos: CellCoord, direction: Direction) -> tuple[str, str]:
+        """Existing tiles directly before and after `pos` in the word crossing a play in `direction`."""
+        row, col = pos
+        if direction == Direction.ACROSS:
+            line, index = self.board.line(Direction.DOWN, col), row
+        else:
+            line, index = self.board.line(Direction.ACROSS, row), col
+        end = line.find(".", index + 1)
+        return line[line.rfind(".", 0, index) + 1:index], line[index + 1:end if end >= 0 else len(line)]
+
+    def cross_mask(self, pos: CellCoord, direction: Direction) -> int:
+        if self.board.is_filled(pos):
+            return 0
+        letters_before, letters_after = self.cross_word(pos, direction)
+        if len(letters_before) == 0 and len(letters_after) == 0:
+            return ALL_LETTERS
+        return self.dictionary.hook_mask(letters_before, letters_after)
+
+    def update_cross_score(self, pos: CellCoord, direction: Direction) -> None:
+        scores = self.cross_scores[direction]
+        scores.pop(pos, None)
+        if self.board.is_filled(pos):
+            return
+        row_delta, col_delta = cross_deltas(direction)
+        score, has_cross_word = 0, False
+        for step in (-1, 1):
+            row, col = pos[0] + step * row_delta, pos[1] + step * col_delta
+            while self.board.is_filled((row, col)):
+                has_cross_word = True
+                if (14 - row, col) not in self.blanks:
+                    score += TILE_SCORE[self.board.tile((row, col))]
+                row, col = row + step * row_delta, col + step * col_delta
+        if has_cross_word:
+            scores[pos] = score
+
+    def tiles_placed(self, board: Board, squares: Iterable[CellCoord], blanks: Iterable[CellCoord] = ()) -> None:
+        """Updates the analysis after tiles were put on `squares` of `board` (board coordinates).
+        `blanks` are the new tiles that are blanks, in screen coordinates.
+
+        Only the squares at either end of the runs through the new tiles can change their
+        cross-checks and cross-scores, and only the new tiles' neighbours can become anchors."""
+        self.board = board
+        self.blanks.update(blanks)
+        if self.first_turn:
+            self.refresh()
+            return
+        for row, col in squares:
+            for direction in Direction:
+                self.cross_masks[direction][(row, col)] = 0
+                self.cross_scores[direction].pop((row, col), None)
+                row_delta, col_delta = cross_deltas(direction)
+                for step in (-1, 1):
+                    end = (row, col)
+                    while self.board.is_filled(end):
+                        end = (end[0] + step * row_delta, end[1] + step * col_delta)
+                    if self.board.in_bounds(end):
+                        self.cross_masks[direction][end] = self.cross_mask(end, direction)
+                        self.update_cross_score(end, direction)
+            self.anchors.discard((row, col))
+            for neighbor in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                if self.board.is_empty(neighbor):
+                    self.anchors.add(neighbor)
@@ -0,0 +1,273 @@
+# Move generator benchmarks over a fixed, versioned corpus of positions (`bench_positions.json`).
+#
+# The corpus holds an empty board, midgame and dense late-game boards taken from seeded greedy games,
+# each with racks holding no, one and two blanks. For every position the suite times the generator's
+# phases, counts moves per second, measures peak memory and times the original pipeline (Appel-Jacobson
+# `SolverState.find_all_options` on a forward DAWG, then `word_score` on every play) for comparison.
+# `--check` runs every generator in `GENERATORS` and fails unless each finds exactly the placements the
+# original pipeline finds, each with its best score over every way of placing the blanks.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TypedDict, TypeVar
+
+import lexicon
+from analysis import BoardAnalysis
+from board import Board, CellCoord, Direction, Letter, Position
+from engine import Game, greedy
+from lexicon import Dawg, Gaddag
+from parallel import ParallelSolver
+from scoring import Play, best_scores, score_raw_plays, word_score
+from solver import GaddagSolverState, PlayCache, SolverState
+
+CORPUS_PATH    = "bench_positions.json"
+CORPUS_VERSION = 1
+CORPUS_SEEDS   = range(1, 4)  # seeded games the midgame and late-game boards come from
+RACK_VARIANTS  = 3  # racks with 0, 1 and 2 blanks per board
+MIDGAME_MOVES  = 6  # moves made before a midgame board is saved
+LATE_GAME_BAG  = 7  # a late-game board is saved once the bag holds this few tiles
+
+T = TypeVar("T")
+
+
+@dataclass
+class BenchPosition:
+    name: str
+    board: Board
+    blanks: set[CellCoord]  # blanks on the board, in screen coordinates
+    rack: list[Letter]
+
+
+class CorpusEntry(TypedDict):
+    name: str
+    board: list[str]          # rows, "." for an empty square
+    blanks: list[list[int]]   # [row, col] of the blanks on the board, in screen coordinates
+    rack: str
+
+
+class Corpus(TypedDict):
+    version: int
+    lexicon: str  # file name of the lexicon the games were played with
+    positions: list[CorpusEntry]
+
+
+Generator = Callable[[Gaddag, BenchPosition], list[Play]]
+
+
+def _serial(lexicon: Gaddag, position: BenchPosition) -> list[Play]:
+    return GaddagSolverState(lexicon, position.board, position.rack[:]).find_all_plays(position.blanks)
+
+
+def _with_analysis(lexicon: Gaddag, position: BenchPosition) -> list[Play]:
+    analysis = BoardAnalysis(lexicon, position.board, position.blanks)
+    return GaddagSolverState(lexicon, position.board, position.rack[:], analysis).find_all_plays(position.blanks)
+
+
+def _iterated(lexicon: Gaddag, position: BenchPosition) -> list[Play]:
+    return list(GaddagSolverState(lexicon, position.board, position.rack[:]).iter_plays(position.blanks))
+
+
+def _cached(lexicon: Gaddag, position: BenchPosition) -> list[Play]:
+    cache = PlayCache()
+    cache.find_all_plays(lexicon, position.board, position.rack, position.blanks)
+    return cache.find_all_plays(lexicon, position.board, position.rack, position.blanks)
+
+
+# Generators checked against the original pipeline by `--check`
+GENERATORS: dict[str, Generator] = {
+    "serial":   _serial,
+    "analysis": _with_analysis,
+    "iterated": _iterated,
+    "cached":   _cached,
+}
+
+
+def _baseline(dawg: Dawg, position: BenchPosition) -> list[Play]:
+    """The original pipeline, as the game ran it before the GADDAG generator."""
+    plays = []
+    for pos, letters, blanks in SolverState(dawg, position.board, position.rack[:]).find_all_options():
+        score = word_score(position.board, dawg, letters, Position(pos.dir, 14 - pos.row, pos.col), True, blanks | position.blanks)
+        if score.is_ok():
+            plays.append(score.unwrap())
+    return plays
+
+
+def reference_plays(dawg: Dawg, position: BenchPosition) -> list[Play]:
+    """The original pipeline's plays, scored for every placement of their blanks."""
+    raw = SolverState(dawg, position.board, position.rack[:]).find_all_options()
+    return score_raw_plays(dawg, position.board, raw, position.blanks)
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list[BenchPosition]:
+    with open(path) as file:
+        corpus: Corpus = json.load(file)
+    if corpus["version"] != CORPUS_VERSION:
+        raise ValueError(f"{path} has corpus version {corpus['version']}, expected {CORPUS_VERSION}")
+    positions = []
+    for entry in corpus["positions"]:
+        board = Board()
+        for row, line in enumerate(entry["board"]):
+            for col, tile in enumerate(line):
+                if tile != ".":
+                    board.set_tile((row, col), tile)
+        positions.append(BenchPosition(entry["name"], board, {(row, col) for row, col in entry["blanks"]}, list(entry["rack"])))
+    return positions
+
+
+def rack_variants(rack: list[Letter]) -> list[list[Letter]]:
+    """The rack with blanks swapped for E, then with its last one and last two tiles swapped for blanks."""
+    rack = ["E" if tile == " " else tile for tile in rack]
+    return [rack[:len(rack) - blanks] + [" "] * blanks for blanks in range(RACK_VARIANTS)]
+
+
+def make_corpus(lexicon: Gaddag, seeds: range, path: str = CORPUS_PATH) -> None:
+    """Writes a new corpus: the empty board, then a midgame and a late-game board per seed."""
+    boards: list[tuple[str, Board, set[CellCoord], list[Letter]]] = [("empty", Board(), set(), list("RETAINS"))]
+    for seed in seeds:
+        game = Game(lexicon, seed)
+        while not game.is_over() and len(game.moves) < MIDGAME_MOVES:
+            game.apply(greedy(game))
+        boards.append((f"midgame-{seed}", game.board.copy(), set(game.blanks), game.rack()[:]))
+        while not game.is_over() and len(game.bag) > LATE_GAME_BAG:
+            game.apply(greedy(game))
+        boards.append((f"late-{seed}", game.board.copy(), set(game.blanks), game.rack()[:]))
+    positions: list[CorpusEntry] = [
+        {"name": f"{name}-{blanks}b", "board": [board.line(Direction.ACROSS, row) for row in range(board.size)],
+         "blanks": [list(pos) for pos in sorted(board_blanks)], "rack": "".join(rack)}
+        for name, board, board_blanks, base_rack in boards
+        for blanks, rack in enumerate(rack_variants(base_rack))]
+    corpus: Corpus = {"version": CORPUS_VERSION, "lexicon": os.path.basename(lexicon.path or ""), "positions": positions}
+    with open(path, "w") as file:
+        json.dump(corpus, file, indent=1)
+        file.write("\n")
+
+
+def _timed(function: Callable[[], T], repeat: int) -> tuple[float, T]:
+    """Median time of `repeat` calls, and the result of the last one."""
+    times = []
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def _generation_time(lexicon: Gaddag, position: BenchPosition, board_blanks: set[CellCoord] | None) -> float:
+    """Time the generator takes given anchors and cross-checks computed beforehand; it scores plays only with `board_blanks`."""
+    solver = GaddagSolverState(lexicon, position.board, position.rack[:], BoardAnalysis(lexicon, position.board, position.blanks))
+    solver.board_blanks = board_blanks
+    start = time.perf_counter()
+    solver.find_all_options()
+    return time.perf_counter() - start
+
+
+def bench_position(lexicon: Gaddag, dawg: Dawg, position: BenchPosition, repeat: int) -> dict[str, float]:
+    """Phase times in seconds, moves per second and peak traced memory of `find_all_plays` on `position`,
+    and the time the original pipeline takes on it with the forward DAWG `dawg`."""
+    solver = GaddagSolverState(lexicon, position.board, position.rack[:])
+    solver.board_blanks = position.blanks
+
+    def anchors() -> None:
+        for direction in Direction:
+            solver.direction = direction
+            solver.find_anchors()
+
+    def cross_checks() -> None:
+        fresh = GaddagSolverState(lexicon, position.board, position.rack[:])  # its cross-check planes are not worked out yet
+        fresh.board_blanks = position.blanks
+        for direction in Direction:
+            fresh.direction = direction
+            fresh.cross_check_masks()
+            fresh.cross_word_scores(fresh.find_anchors())
+
+    anchor_time, _ = _timed(anchors, repeat)
+    cross_time, _  = _timed(cross_checks, repeat)
+    generation     = statistics.median(_generation_time(lexicon, position, None) for _ in range(repeat))
+    scored         = statistics.median(_generation_time(lexicon, position, position.blanks) for _ in range(repeat))
+    total, plays   = _timed(lambda: _serial(lexicon, position), repeat)
+    baseline, _    = _timed(lambda: _baseline(dawg, position), repeat)
+
+    tracemalloc.start()
+    _serial(lexicon, position)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"moves": len(plays), "total": total, "moves_per_second": len(plays) / total, "anchors": anchor_time,
+            "cross_checks": cross_time, "generation": generation, "scoring": max(0.0, scored - generation),
+            "peak_memory": peak, "baseline": baseline}
+
+
+def check_generators(lexicon: Gaddag, dawg: Dawg, positions: list[BenchPosition], generators: dict[str, Generator]) -> list[str]:
+    """Names of the (generator, position) pairs whose placements or best scores differ from the original pipeline's."""
+    failures = []
+    for position in positions:
+        reference = best_scores(reference_plays(dawg, position))
+        for name, generator in generators.items():
+            found = best_scores(generator(lexicon, position))
+            if found != reference:
+                missing  = len(reference.keys() - found.keys())
+                extra    = len(found.keys() - reference.keys())
+                rescored = sum(found[key] != score for key, score in reference.items() if key in found)
+                failures.append(f"{name} on {position.name}: {len(found)} placements, {missing} missing, {extra} extra, {rescored} scored differently")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the move generator on a fixed corpus of positions")
+    parser.add_argument("--lexicon", help="compiled GADDAG to use instead of NWL2020")
+    parser.add_argument("--dawg", help="compiled DAWG for the original pipeline; by default the .dawg next to --lexicon")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the median is reported")
+    parser.add_argument("--check", action="store_true", help="check every generator finds the original pipeline's placements and best scores")
+    parser.add_argument("--workers", type=int, help="also check the parallel generator with this many workers")
+    parser.add_argument("--json", help="write the measurements to this file")
+    parser.add_argument("--make-corpus", action="store_true", help=f"write a new corpus (version {CORPUS_VERSION}) and exit")
+    args = parser.parse_args()
+
+    lex  = lexicon.load_gaddag(args.lexicon) if args.lexicon else lexicon.nwl_2020(gaddag=True)
+    dawg = lexicon.load(args.dawg or os.path.splitext(args.lexicon)[0] + ".dawg") if args.dawg or args.lexicon else lexicon.nwl_2020()
+    if args.make_corpus:
+        make_corpus(lex, CORPUS_SEEDS, args.corpus)
+        return
+    positions = load_corpus(args.corpus)
+
+    if args.check:
+        generators = dict(GENERATORS)
+        if args.workers:
+            assert lex.path is not None  # a loaded lexicon knows its file
+            parallel = ParallelSolver(lex.path, args.workers)
+            generators["parallel"] = lambda _, position: parallel.find_all_plays(position.board, position.rack, position.blanks)
+        failures = check_generators(lex, dawg, positions, generators)
+        print("\n".join(failures) or f"{len(generators)} generators agree with the original pipeline on {len(positions)} positions")
+        if args.workers:
+            parallel.close()
+        if failures:
+            sys.exit(1)
+        return
+
+    results = {}
+    print(f"{'position':<16}{'moves':>7}{'moves/s':>10}{'total ms':>10}{'anchors':>9}{'cross':>9}{'generate':>10}{'score':>9}"
+          f"{'peak KiB':>10}{'original':>10}")
+    for position in positions:
+        result = results[position.name] = bench_position(lex, dawg, position, args.repeat)
+        print(f"{position.name:<16}{result['moves']:>7}{result['moves_per_second']:>10.0f}{1000 * result['total']:>10.1f}"
+              + "".join(f"{1000 * result[phase]:>{width}.1f}" for phase, width in
+                        (("anchors", 9), ("cross_checks", 9), ("generation", 10), ("scoring", 9)))
+              + f"{result['peak_memory'] / 1024:>10.0f}{1000 * result['baseline']:>10.1f}")
+    moves, total = sum(result["moves"] for result in results.values()), sum(result["total"] for result in results.values())
+    baseline     = sum(result["baseline"] for result in results.values())
+    print(f"{moves} moves in {1000 * total:.0f} ms, {moves / total:.0f} moves per second; "
+          f"the original pipeline takes {1000 * baseline:.0f} ms ({baseline / total:.1f}x)")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"corpus_version": CORPUS_VERSION, "positions": results}, file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
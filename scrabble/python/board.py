@@ -1,7 +1,8 @@
 # Inital code taken from https://github.com/boringcactus/Appel-Jacobson-scrabble/blob/canon/board.py
 
-import copy
 import itertools as it
+import random
+import string
 from dataclasses import dataclass
 from enum import IntEnum
 
@@ -9,6 +10,15 @@ Letter= str # synonym for str, but make it clear that it's a letter
 
 CellCoord = tuple[int, int]
 
+SIZE          = 15
+EMPTY         = ord(".")
+FULL_LINE     = (1 << SIZE) - 1
+ALL_POSITIONS = list(it.product(range(SIZE), range(SIZE)))
+
+# Zobrist keys: a board's hash is the XOR of the keys of its (square, letter) pairs, squares numbered row by row
+_keys        = random.Random(15)
+ZOBRIST_KEYS = [{letter: _keys.getrandbits(64) for letter in string.ascii_uppercase} for _ in range(SIZE * SIZE)]
+
 
 class Direction(IntEnum):
     ACROSS = 1
@@ -23,39 +33,112 @@ class Position:
 
 
 class Board:
+    """15x15 board kept as one flat byte per square ("." when empty), row by row and, transposed, column
+    by column, with a bitboard of the filled squares of every row and of every column."""
     size: int
-    _tiles: list[list[Letter]]
+    _rows: bytearray                       # square (row, col) at row * SIZE + col
+    _columns: bytearray                    # square (row, col) at col * SIZE + row
+    row_bits: list[int]                    # bit `col` of `row_bits[row]` is set when (row, col) is filled
+    col_bits: list[int]                    # bit `row` of `col_bits[col]` is set when (row, col) is filled
+    hash: int                              # Zobrist hash of the tiles, kept up to date by `set_tile`
+    _history: list[tuple[CellCoord, int]]  # (square, previous byte) of every `set_tile`, for `undo`
 
     def __init__(self) -> None:
-        self.size = 15
-        self._tiles = [["."] * self.size for i in range(self.size)]
+        self.size     = SIZE
+        self._rows    = bytearray(b"." * SIZE * SIZE)
+        self._columns = bytearray(b"." * SIZE * SIZE)
+        self.row_bits = [0] * SIZE
+        self.col_bits = [0] * SIZE
+        self.hash     = 0
+        self._history = []
 
     def __str__(self) -> str:
-        return "\n".join("".join(x if x != "." else "_" for x in row) for row in self._tiles)
+        return "\n".join(self.line(Direction.ACROSS, row).replace(".", "_") for row in range(SIZE))
 
     def all_positions(self) -> list[CellCoord]:
-        return list(it.product(range(0, self.size), range(0, self.size)))
+        return ALL_POSITIONS[:]
+
+    def filled_positions(self) -> list[CellCoord]:
+        return [(row, col) for row, bits in enumerate(self.row_bits) if bits for col in range(SIZE) if bits >> col & 1]
+
+    def line(self, direction: Direction, index: int) -> str:
+        """Row `index` (ACROSS) or column `index` (DOWN) as a string, "." for the empty squares."""
+        start = index * SIZE
+        return (self._rows if direction == Direction.ACROSS else self._columns)[start:start + SIZE].decode()
+
+    def tiles(self) -> bytes:
+        """Every square row by row, "." for the empty ones; equal for boards with the same tiles."""
+        return bytes(self._rows)
 
     def tile(self, pos: CellCoord) -> Letter:
         row, col = pos
-        return self._tiles[row][col]
+        return chr(self._rows[row * SIZE + col])
 
     def set_tile(self, pos: CellCoord, tile: Letter) -> None:
         row, col = pos
-        self._tiles[row][col] = tile
+        previous = self._rows[row * SIZE + col]
+        self._history.append((pos, previous))
+        self._write(row, col, previous, ord(tile))
+
+    def _write(self, row: int, col: int, previous: int, byte: int) -> None:
+        if previous != EMPTY:
+            self.hash ^= ZOBRIST_KEYS[row * SIZE + col][chr(previous)]
+        if byte != EMPTY:
+            self.hash          ^= ZOBRIST_KEYS[row * SIZE + col][chr(byte)]
+            self.row_bits[row] |= 1 << col
+            self.col_bits[col] |= 1 << row
+        else:
+            self.row_bits[row] &= ~(1 << col)
+            self.col_bits[col] &= ~(1 << row)
+        self._rows[row * SIZE + col]    = byte
+        self._columns[col * SIZE + row] = byte
+
+    def checkpoint(self) -> int:
+        """Marks the current tiles; `undo(checkpoint)` takes back every `set_tile` made since."""
+        return len(self._history)
+
+    def undo(self, checkpoint: int) -> None:
+        while len(self._history) > checkpoint:
+            (row, col), previous = self._history.pop()
+            self._write(row, col, self._rows[row * SIZE + col], previous)
+
+    def commit(self) -> None:
+        """Keeps the tiles placed so far for good: forgets their undo history, and with it every checkpoint."""
+        self._history.clear()
 
     def in_bounds(self, pos: CellCoord) -> bool:
         row, col = pos
-        return row >= 0 and row < self.size and col >= 0 and col < self.size
+        return 0 <= row < SIZE and 0 <= col < SIZE
 
     def is_empty(self, pos: CellCoord) -> bool:
-        return self.in_bounds(pos) and self.tile(pos) == "."
+        row, col = pos
+        return 0 <= row < SIZE and 0 <= col < SIZE and not self.row_bits[row] >> col & 1
 
     def is_filled(self, pos: CellCoord) -> bool:
-        return self.in_bounds(pos) and self.tile(pos) != "."
+        row, col = pos
+        return 0 <= row < SIZE and 0 <= col < SIZE and self.row_bits[row] >> col & 1 == 1
 
     def is_first_turn(self) -> bool:
-        return all("." == c for c in it.chain(*self._tiles))
+        return not any(self.row_bits)
+
+    def anchors(self) -> list[CellCoord]:
+        """Empty squares next to a filled one, row by row."""
+        anchors = []
+        for row, bits in enumerate(self.row_bits):
+            above     = self.row_bits[row - 1] if row > 0 else 0
+            below     = self.row_bits[row + 1] if row < SIZE - 1 else 0
+            neighbors = (bits << 1 | bits >> 1 | above | below) & ~bits & FULL_LINE
+            anchors  += [(row, col) for col in range(SIZE) if neighbors >> col & 1]
+        return anchors
 
     def copy(self) -> "Board":  # This is a recursive type annotation, actually a limitation of mypy
-        return copy.deepcopy(self)
+        """Same tiles and hash; the copy starts with no undo history."""
+        board          = Board.__new__(Board)
+        board.size     = SIZE
+        board._rows    = self._rows[:]
+        board._columns = self._columns[:]
+        board.row_bits = self.row_bits[:]
+        board.col_bits = self.col_bits[:]
+        board.hash     = self.hash
+        board._history = []
+        return board
@@ -0,0 +1,294 @@
+# Exact endgame search for positions where the bag is empty and both racks are known.
+#
+# Negamax with alpha-beta over the rest of the game: a node's value is the points the player to
+# move will still score minus the points their opponent will, including the bonus of twice the
+# tiles left on the other rack for going out. The search deepens one ply at a time, each iteration
+# first in a narrow window around the last one's value, and remembers positions in a transposition
+# table keyed on the board's Zobrist hash combined with keys for the blanks on the board, both racks,
+# the player to move and the scoreless streak. Moves are ordered with the table's best move first,
+# then the killer moves that refuted a sibling position at the same ply; the moves after the first
+# are searched with a null window, and again with the full window only if they beat the best so far.
+#
+# Generating moves is most of the work, so a rack's plays are generated in full only once and then
+# carried from board to board, searching again only the lines where the tiles differ. On the test
+# lexicon most endgames with seven tiles on each rack are still cut off by a budget of seconds;
+# `Solution.exact` says whether the result was, and the window shows it.
+
+import math
+import random
+import time
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass, field
+
+from analysis import BoardAnalysis
+from board import EMPTY, SIZE, Board, CellCoord, Direction, Letter
+from lexicon import Gaddag
+from scoring import MAX_SCORELESS_TURNS, Play, place, rack_value
+from solver import BLANK, GaddagSolverState, rack_counts
+
+MAX_DEPTH       = 64
+CHECK_INTERVAL  = 64      # nodes between looks at the clock
+MOVE_CACHE_SIZE = 20_000  # positions whose generated moves are kept for the next, deeper iteration
+KILLERS         = 2       # killer moves kept per ply
+ASPIRATION      = 10      # half width of the window around the last iteration's value the next one tries first
+
+EXACT, LOWER, UPPER = 0, 1, 2  # what a transposition table value is: the exact value, or a bound on it
+
+Line = tuple[Play | None, ...]  # moves of both players in turn, None for a pass
+Undo = tuple[int, list[Letter], BoardAnalysis, set[CellCoord], int, int]  # see `EndgameSolver.make`
+
+_keys           = random.Random(2020)
+_BLANK_KEYS     = [[_keys.getrandbits(64) for _ in range(15)] for _ in range(15)]
+_RACK_KEYS      = [[[_keys.getrandbits(64) for _ in range(8)] for _ in range(BLANK + 1)] for _ in range(2)]
+_SCORELESS_KEYS = [_keys.getrandbits(64) for _ in range(MAX_SCORELESS_TURNS + 1)]
+_TURN_KEY       = _keys.getrandbits(64)
+
+
+def changed_lines(before: bytes, after: bytes) -> tuple[set[int], set[int]]:
+    """Rows and columns, given the `Board.tiles` of two boards, outside which every play is the same
+    on both: legal on both or neither, for the same score.
+
+    Around each square that differs these are its row and column, the ones either side, and the ones
+    just past the tiles running through it on either board, which cross words may reach."""
+    rows: set[int]    = set()
+    columns: set[int] = set()
+    filled = bytes(EMPTY if old == new == EMPTY else 1 for old, new in zip(before, after))
+    for square, (old, new) in enumerate(zip(before, after)):
+        if old == new:
+            continue
+        row, col = divmod(square, SIZE)
+        top = bottom = row
+        while top > 0 and filled[square - (row - top + 1) * SIZE] != EMPTY:
+            top -= 1
+        while bottom < SIZE - 1 and filled[square + (bottom - row + 1) * SIZE] != EMPTY:
+            bottom += 1
+        left = right = col
+        while left > 0 and filled[square - (col - left + 1)] != EMPTY:
+            left -= 1
+        while right < SIZE - 1 and filled[square + (right - col + 1)] != EMPTY:
+            right += 1
+        rows.update(range(max(top - 1, 0), min(bottom + 2, SIZE)))
+        columns.update(range(max(left - 1, 0), min(right + 2, SIZE)))
+    return rows, columns
+
+
+def rack_key(player: int, counts: Sequence[int]) -> int:
+    key = 0
+    for slot, count in enumerate(counts):
+        key ^= _RACK_KEYS[player][slot][count]
+    return key
+
+
+@dataclass(frozen=True)
+class Entry:
+    depth: int
+    value: float
+    kind: int
+    line: Line
+    exact: bool  # no horizon was reached below this position
+
+
+@dataclass
+class Solution:
+    value: float                                               # spread the player to move gets from here on
+    moves: list[Play | None] = field(default_factory=list)     # best line for both players, None for a pass
+    exact: bool = False                                        # False when the time budget stopped the search first
+    depth: int = 0
+    nodes: int = 0
+
+
+class _OutOfTimeError(Exception):
+    pass
+
+
+class EndgameSolver:
+    board: Board
+    blanks: set[CellCoord]  # blanks on the board, in screen coordinates
+    racks: list[list[Letter]]
+    turn: int
+    table: dict[int, Entry]
+    move_cache: dict[int, list[Play | None]]
+    generated: dict[int, tuple[bytes, list[Play]]]
+
+    def __init__(self, lexicon: Gaddag, board: Board, blanks: set[CellCoord], racks: Sequence[Sequence[Letter]],
+                 turn: int = 0, scoreless_turns: int = 0, analysis: BoardAnalysis | None = None,
+                 exclude: Collection[str] = ()) -> None:
+        """`racks[turn]` is the rack of the player to move, who never plays a word in `exclude`; the search
+        works on copies of `board` and `analysis`."""
+        self.lexicon         = lexicon
+        self.board           = board.copy()
+        self.blanks          = set(blanks)
+        self.analysis        = analysis.copy(self.board) if analysis else BoardAnalysis(lexicon, self.board, blanks)
+        self.racks           = [list(rack) for rack in racks]
+        self.turn            = turn
+        self.player          = turn
+        self.exclude         = exclude
+        self.scoreless_turns = scoreless_turns
+        self.table           = {}
+        self.move_cache      = {}
+        self.generated       = {}  # per player and rack, the board whose plays were generated last, and those plays
+        self.killers: dict[int, list[Play]] = {}  # per ply from the root, moves that caused a cutoff there, latest first
+        self.ply             = 0
+        self.nodes           = 0
+        self.horizons        = 0  # depth-limited evaluations so far; none in an iteration means its result is exact
+        self.deadline        = math.inf
+        self.hash            = rack_key(0, rack_counts(self.racks[0])) ^ rack_key(1, rack_counts(self.racks[1]))
+        self.hash           ^= _SCORELESS_KEYS[scoreless_turns] ^ (_TURN_KEY if turn else 0)
+        for row, col in self.blanks:
+            self.hash ^= _BLANK_KEYS[14 - row][col]
+
+    def key(self) -> int:
+        """Transposition table key of the current position."""
+        return self.board.hash ^ self.hash
+
+    def moves(self) -> list[Play | None]:
+        """Plays of the player to move, those going out first, then by score; passing comes last."""
+        key   = self.key()
+        plays = self.move_cache.get(key)
+        if plays is None:
+            found = self.generate()
+            plays = [*sorted(found, key=lambda play: (play.leave == "", play.score), reverse=True), None]
+            if len(self.move_cache) < MOVE_CACHE_SIZE:
+                self.move_cache[key] = plays
+        return plays[:]
+
+    def generate(self) -> list[Play]:
+        """Plays of the player to move. The plays last generated for the same rack are kept outside the
+        `changed_lines` of the board they were generated on, and only those lines are searched again."""
+        rack    = self.racks[self.turn]
+        tiles   = self.board.tiles()
+        exclude = self.exclude if self.turn == self.player else ()
+        state   = GaddagSolverState(self.lexicon, self.board, rack, self.analysis)
+        rack_id = rack_key(self.turn, rack_counts(rack))
+        if rack_id not in self.generated:
+            found = list(state.iter_plays(self.blanks, exclude=exclude))
+        else:
+            before, plays = self.generated[rack_id]
+            rows, columns = changed_lines(before, tiles)
+            found = [play for play in plays if (14 - play.pos.row not in rows if play.pos.dir == Direction.ACROSS else play.pos.col not in columns)]
+            if rows:
+                found += state.iter_plays(self.blanks, directions=(Direction.ACROSS,), exclude=exclude,
+                                          region={(row, col) for row in rows for col in range(SIZE)})
+            if columns:
+                found += state.iter_plays(self.blanks, directions=(Direction.DOWN,), exclude=exclude,
+                                          region={(row, col) for row in range(SIZE) for col in columns})
+        self.generated[rack_id] = (tiles, found)
+        return found
+
+    def make(self, play: Play | None) -> Undo:
+        """Makes `play` for the player to move; returns what `unmake` needs to take it back."""
+        rack = self.racks[self.turn]
+        undo: Undo = (self.board.checkpoint(), rack[:], self.analysis, self.blanks, self.scoreless_turns, self.hash)
+        self.hash ^= _SCORELESS_KEYS[self.scoreless_turns] ^ rack_key(self.turn, rack_counts(rack))
+        if play is None:
+            self.scoreless_turns += 1
+        else:
+            squares = place(self.board, play, self.blanks)
+            for row, col in squares:
+                if (14 - row, col) in play.blanks:
+                    rack.remove(" ")
+                    self.hash ^= _BLANK_KEYS[row][col]
+                else:
+                    rack.remove(self.board.tile((row, col)))
+            self.analysis = self.analysis.copy(self.board)
+            self.analysis.tiles_placed(self.board, squares, play.blanks)
+            self.blanks          = self.blanks | play.blanks
+            self.scoreless_turns = 0 if play.score else self.scoreless_turns + 1
+        self.hash ^= _SCORELESS_KEYS[self.scoreless_turns] ^ rack_key(self.turn, rack_counts(rack)) ^ _TURN_KEY
+        self.turn  = 1 - self.turn
+        self.ply  += 1
+        return undo
+
+    def unmake(self, undo: Undo) -> None:
+        checkpoint, rack, self.analysis, self.blanks, self.scoreless_turns, self.hash = undo
+        self.turn = 1 - self.turn
+        self.ply -= 1
+        self.racks[self.turn] = rack
+        self.board.undo(checkpoint)
+
+    def search(self, depth: int, alpha: float, beta: float) -> tuple[float, Line]:
+        """Value of the position for the player to move, searched `depth` plies deep, and the line that gets it."""
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and time.monotonic() > self.deadline:
+            raise _OutOfTimeError
+        rack, other = self.racks[self.turn], self.racks[1 - self.turn]
+        if not other:  # the opponent just went out
+            return -2 * rack_value(rack), ()
+        if self.scoreless_turns >= MAX_SCORELESS_TURNS:
+            return 0, ()
+        if depth == 0:
+            self.horizons += 1
+            return rack_value(other) - rack_value(rack), ()
+
+        key   = self.key()
+        entry = self.table.get(key)
+        if entry and entry.depth >= depth:
+            if entry.kind == EXACT or (entry.kind == LOWER and entry.value >= beta) or (entry.kind == UPPER and entry.value <= alpha):
+                self.horizons += not entry.exact
+                return entry.value, entry.line
+
+        moves   = self.moves()
+        best    = entry.line[0] if entry and entry.line else None
+        killers = self.killers.setdefault(self.ply, [])
+        if best is not None or killers:  # the best move of a shallower search, then the killers, then the rest in order
+            moves.sort(key=lambda play: 0 if play is not None and play == best else 1 if play in killers else 2)
+        original_alpha, horizons_before = alpha, self.horizons
+        best_value: float = -math.inf
+        best_line: Line   = ()
+        value: float
+        line: Line
+        for i, play in enumerate(moves):
+            gain = play.score if play else 0
+            if depth == 1 and play is not None and gain:
+                # the reply would not be searched, so there is no need to make the play: going out
+                # ends the game, anything else is judged on the racks left
+                if play.leave:
+                    self.horizons += 1
+                    value, line = gain - rack_value(play.leave) + rack_value(other), ()
+                else:
+                    value, line = gain + 2 * rack_value(other), ()
+            else:
+                undo = self.make(play)
+                try:
+                    if i == 0 or alpha == -math.inf:
+                        value, line = self.search(depth - 1, gain - beta, gain - alpha)
+                    else:
+                        value, line = self.search(depth - 1, gain - alpha - 1, gain - alpha)
+                        if alpha < gain - value < beta:  # beats the best so far: find by how much
+                            value, line = self.search(depth - 1, gain - beta, gain - alpha)
+                finally:
+                    self.unmake(undo)
+                value = gain - value
+            if value > best_value:
+                best_value, best_line = value, (play, *line)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                if play is not None and play != best and play not in killers:
+                    killers.insert(0, play)
+                    del killers[KILLERS:]
+                break
+
+        kind = UPPER if best_value <= original_alpha else LOWER if best_value >= beta else EXACT
+        self.table[key] = Entry(depth, best_value, kind, best_line, self.horizons == horizons_before)
+        return best_value, best_line
+
+    def solve(self, time_budget: float | None = None, max_depth: int = MAX_DEPTH) -> Solution:
+        """Deepens the search until its result no longer depends on the depth limit, `max_depth` is reached
+        or `time_budget` seconds run out; then returns the deepest finished result."""
+        self.deadline = math.inf if time_budget is None else time.monotonic() + time_budget
+        solution      = Solution(-math.inf)
+        for depth in range(1, max_depth + 1):
+            horizons_before = self.horizons
+            alpha, beta     = (solution.value - ASPIRATION, solution.value + ASPIRATION) if depth > 1 else (-math.inf, math.inf)
+            try:
+                value, line = self.search(depth, alpha, beta)
+                if not alpha < value < beta:  # only a bound on the value: search again with the full window
+                    horizons_before = self.horizons
+                    value, line     = self.search(depth, -math.inf, math.inf)
+            except _OutOfTimeError:
+                break
+            solution = Solution(value, list(line), self.horizons == horizons_before, depth, self.nodes)
+            if solution.exact:
+                break
+        solution.nodes = self.nodes
+        return solution
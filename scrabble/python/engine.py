@@ -0,0 +1,257 @@
+# Headless bot-vs-bot games: the bag, turns and end-of-game scoring of `MyGame`, without a window.
+#
+# A bot is any callable that takes the `Game` and returns the play to make for the player to move,
+# or None to pass. Bots should only look at the board, their own rack and `Game.unseen()`.
+
+import argparse
+import math
+import random
+import statistics
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from functools import cache
+
+import leaves
+from analysis import BoardAnalysis
+from board import Board, CellCoord, Letter
+from endgame import EndgameSolver
+from lexicon import Gaddag, load_gaddag, nwl_2020
+from scoring import MAX_SCORELESS_TURNS, RACK_SIZE, TILE_BAG, Play, place, rack_value
+from solver import GaddagSolverState
+
+ENDGAME_TIME_BUDGET = 10.0  # seconds the endgame bot may think once the bag is empty
+Z_95                = 1.96  # normal quantile for 95% confidence intervals
+
+Bot = Callable[["Game"], Play | None]
+
+
+class Game:
+    lexicon: Gaddag
+    board: Board
+    bag: list[Letter]
+    racks: list[list[Letter]]
+    scores: list[int]
+    blanks: set[CellCoord]  # blanks on the board, in screen coordinates like `MyGame.blank_letters`
+    turn: int               # index of the player to move
+    moves: list[Play | None]
+
+    def __init__(self, lexicon: Gaddag, seed: int, first: int = 0) -> None:
+        self.lexicon         = lexicon
+        self.rng             = random.Random(seed)
+        self.bag             = TILE_BAG[:]
+        self.rng.shuffle(self.bag)
+        self.board           = Board()
+        self.analysis        = BoardAnalysis(lexicon, self.board)
+        self.racks           = [self.draw(RACK_SIZE), self.draw(RACK_SIZE)]
+        self.scores          = [0, 0]
+        self.blanks          = set()
+        self.turn            = first
+        self.moves           = []
+        self.scoreless_turns = 0
+
+    @classmethod
+    def from_position(cls, analysis: BoardAnalysis, blanks: set[CellCoord], racks: list[list[Letter]], bag: list[Letter],
+                      rng: random.Random, turn: int = 0) -> "Game":
+        """A game continuing from a position; it plays on its own copies of the analysis' board and of `racks` and `bag`.
+        The analysis must be of a GADDAG, which the game generates its moves with."""
+        assert isinstance(analysis.dictionary, Gaddag)
+        game                 = cls.__new__(cls)
+        game.lexicon         = analysis.dictionary
+        game.rng             = rng
+        game.bag             = bag[:]
+        game.board           = analysis.board.copy()
+        game.analysis        = analysis.copy(game.board)
+        game.racks           = [rack[:] for rack in racks]
+        game.scores          = [0, 0]
+        game.blanks          = set(blanks)
+        game.turn            = turn
+        game.moves           = []
+        game.scoreless_turns = 0
+        return game
+
+    def draw(self, count: int) -> list[Letter]:
+        tiles, self.bag = self.bag[:count], self.bag[count:]
+        return tiles
+
+    def rack(self) -> list[Letter]:
+        return self.racks[self.turn]
+
+    def unseen(self) -> list[Letter]:
+        """Tiles the player to move cannot see: the bag and the opponent's rack."""
+        return sorted(self.bag + self.racks[1 - self.turn])
+
+    def solver(self, rack: Sequence[Letter] | None = None) -> GaddagSolverState:
+        return GaddagSolverState(self.lexicon, self.board, list(self.rack() if rack is None else rack), self.analysis)
+
+    def is_over(self) -> bool:
+        return not all(self.racks) or self.scoreless_turns >= MAX_SCORELESS_TURNS
+
+    def apply(self, play: Play | None) -> None:
+        """Makes `play` (None passes) for the player to move, refills their rack and hands the turn over."""
+        rack = self.rack()
+        if play is None:
+            self.scoreless_turns += 1
+        else:
+            squares = place(self.board, play, self.blanks)
+            for row, col in squares:
+                rack.remove(" " if (14 - row, col) in play.blanks else self.board.tile((row, col)))
+            self.blanks |= play.blanks
+            self.analysis.tiles_placed(self.board, squares, play.blanks)
+            self.board.commit()
+            rack += self.draw(RACK_SIZE - len(rack))
+            self.scores[self.turn] += play.score
+            self.scoreless_turns    = 0 if play.score else self.scoreless_turns + 1
+        self.moves.append(play)
+        self.turn = 1 - self.turn
+
+    def finish(self) -> None:
+        """Whoever went out gets twice the value of the tiles left on the other rack."""
+        for player in (0, 1):
+            if not self.racks[player]:
+                self.scores[player] += 2 * rack_value(self.racks[1 - player])
+
+
+def greedy(game: Game) -> Play | None:
+    """Always makes the highest-scoring play."""
+    plays = game.solver().find_top_k(1, game.blanks)
+    return plays[0] if plays else None
+
+
+@cache
+def known_words(path: str = "know.txt") -> frozenset[str]:
+    with open(path) as file:
+        return frozenset(line.strip() for line in file)
+
+
+def skip_known(game: Game) -> Play | None:
+    """Like the computer in `MyGame`: the highest-scoring play whose word is not in know.txt."""
+    plays = game.solver().find_top_k(1, game.blanks, exclude=known_words())
+    return plays[0] if plays else None
+
+
+@cache
+def leave_table() -> leaves.LeaveTable:
+    return leaves.nwl_2020()
+
+
+def equity(game: Game) -> Play | None:
+    """The play with the best score plus leave value; just the best score once the bag is empty."""
+    plays = game.solver().find_all_plays(game.blanks)
+    if not plays:
+        return None
+    return max(plays, key=leave_table().equity) if game.bag else max(plays)
+
+
+def endgame(game: Game) -> Play | None:
+    """Greedy while there are tiles in the bag; after that the best move the endgame solver finds in time."""
+    if game.bag:
+        return greedy(game)
+    solution = EndgameSolver(game.lexicon, game.board, game.blanks, game.racks, game.turn, game.scoreless_turns,
+                             game.analysis).solve(ENDGAME_TIME_BUDGET)
+    return solution.moves[0] if solution.moves else greedy(game)
+
+
+BOTS: dict[str, Bot] = {"greedy": greedy, "skip_known": skip_known, "equity": equity, "endgame": endgame}
+
+
+@dataclass(frozen=True)
+class GameResult:
+    seed: int
+    first: int
+    scores: tuple[int, int]
+    turns: int
+
+    @property
+    def winner(self) -> int | None:
+        if self.scores[0] == self.scores[1]:
+            return None
+        return 0 if self.scores[0] > self.scores[1] else 1
+
+
+def play_game(lexicon: Gaddag, bots: Sequence[Bot], seed: int, first: int = 0) -> GameResult:
+    game = Game(lexicon, seed, first)
+    while not game.is_over():
+        game.apply(bots[game.turn](game))
+    game.finish()
+    return GameResult(seed, first, (game.scores[0], game.scores[1]), len(game.moves))
+
+
+@dataclass
+class Summary:
+    results: list[GameResult] = field(default_factory=list)
+
+    def add(self, result: GameResult) -> None:
+        self.results.append(result)
+
+    def wins(self, player: int) -> int:
+        return sum(result.winner == player for result in self.results)
+
+    def ties(self) -> int:
+        return sum(result.winner is None for result in self.results)
+
+    def win_rate(self, player: int) -> float:
+        """Share of games won, counting a tie as half a win."""
+        return (self.wins(player) + self.ties() / 2) / len(self.results) if self.results else 0.0
+
+    def win_rate_interval(self, player: int, z: float = Z_95) -> tuple[float, float]:
+        """Normal-approximation confidence interval of `win_rate`."""
+        n, rate = len(self.results), self.win_rate(player)
+        half    = z * math.sqrt(rate * (1 - rate) / n) if n else 0.0
+        return max(0.0, rate - half), min(1.0, rate + half)
+
+    def scores(self, player: int) -> list[int]:
+        return [result.scores[player] for result in self.results]
+
+    def spreads(self) -> list[int]:
+        """Player 0's score minus player 1's, per game."""
+        return [result.scores[0] - result.scores[1] for result in self.results]
+
+    def spread_interval(self, z: float = Z_95) -> tuple[float, float]:
+        spreads = self.spreads()
+        if len(spreads) < 2:
+            return (math.nan, math.nan)
+        mean, half = statistics.mean(spreads), z * statistics.stdev(spreads) / math.sqrt(len(spreads))
+        return mean - half, mean + half
+
+    def report(self, names: Sequence[str]) -> str:
+        low, high = self.spread_interval()
+        lines = [f"{len(self.results)} games, {self.ties()} ties, spread 95% CI [{low:+.1f}, {high:+.1f}]"]
+        for player, name in enumerate(names):
+            scores = self.scores(player)
+            if len(scores) < 2:
+                continue
+            q1, median, q3 = statistics.quantiles(scores, n=4)
+            low, high      = self.win_rate_interval(player)
+            lines.append(f"{player}:{name:<10} win rate {self.win_rate(player):6.1%} [{low:.1%}, {high:.1%}]   "
+                         f"score mean {statistics.mean(scores):6.1f}  sd {statistics.stdev(scores):5.1f}   "
+                         f"min {min(scores)}  q1 {q1:.0f}  median {median:.0f}  q3 {q3:.0f}  max {max(scores)}")
+        return "\n".join(lines)
+
+
+def run_games(lexicon: Gaddag, bots: Sequence[Bot], games: int, seed: int = 0) -> Summary:
+    """Plays `games` seeded games; game i uses seed `seed + i` and the bots take turns going first."""
+    summary = Summary()
+    for i in range(games):
+        summary.add(play_game(lexicon, bots, seed + i, i % 2))
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play seeded bot-vs-bot games without the game window")
+    parser.add_argument("bots", nargs=2, choices=sorted(BOTS))
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lexicon", help="compiled GADDAG to use instead of NWL2020")
+    args = parser.parse_args()
+
+    lexicon = load_gaddag(args.lexicon) if args.lexicon else nwl_2020(gaddag=True)
+    start   = time.perf_counter()
+    summary = run_games(lexicon, [BOTS[name] for name in args.bots], args.games, args.seed)
+    elapsed = time.perf_counter() - start
+    print(summary.report(args.bots))
+    print(f"{elapsed:.1f}s, {args.games / elapsed * 60:.0f} games per minute")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# Optional instrumentation of move generation, for finding slow boards and racks in live games.
+#
+# Nothing is measured until `enable` is called. While a `turn` is open, every solver created
+# gets counting and timing wrappers installed on the instance itself (nodes visited, anchors
+# searched, plays emitted, tiles and letters the search turns down, time per phase), so solvers
+# made with instrumentation off run the plain methods and pay nothing. Searches running in worker
+# processes record their part in the worker (`worker_turn`) and send the record back with their
+# plays, for the parent to merge into the turn it records. A phase's time leaves out the timed
+# calls made inside it (generation leaves out the scoring it does inline), so the phases of a turn
+# add up. Each turn is written out as one JSON line, and the latencies of the last turns of each
+# kind are kept for percentiles and a histogram.
+
+import functools
+import json
+import math
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import IO, Any, TypeVar, cast
+
+HISTOGRAM_WINDOW = 1000  # turns of each kind kept for the latency histogram
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# solver methods whose calls are counted (a call is one lexicon node visited, one anchor or one play)
+COUNTED_METHODS = {"extend_before": "nodes", "extend_beyond": "nodes", "before_part": "nodes", "extend_after": "nodes",
+                   "generate_at": "anchors", "record_play": "plays", "legal_move": "plays"}
+# solver methods after whose calls the solver's `rejections` says what the search turned down on the square
+# they looked at: tiles the lexicon cannot continue with ("lexicon_misses") and rack letters a cross-check
+# rules out ("cross_check_misses")
+REJECTING_METHODS = ("generate_at", "extend_before", "extend_beyond")
+# solver methods whose time, less that of the timed methods they call, is added to a phase
+TIMED_METHODS   = {"find_anchors": "anchors", "cross_check_masks": "cross_checks",
+                   "cross_word_scores": "cross_checks", "generate_at": "generation", "score_play": "scoring"}
+
+
+@dataclass
+class TurnRecord:
+    kind: str
+    context: dict[str, Any]
+    start: float = field(default_factory=time.time)
+    latency_ms: float = 0.0
+    counters: Counter[str] = field(default_factory=Counter)
+    phases_ms: dict[str, float] = field(default_factory=dict)
+    nested: list[float] = field(default_factory=list, repr=False)  # per timed call in progress, seconds spent in the calls it made
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.phases_ms[phase] = self.phases_ms.get(phase, 0.0) + 1000 * seconds
+
+    def merge(self, other: "TurnRecord") -> None:
+        """Adds the counters and phase times of `other`, a part of this turn recorded elsewhere."""
+        self.counters.update(other.counters)
+        for phase, ms in other.phases_ms.items():
+            self.phases_ms[phase] = self.phases_ms.get(phase, 0.0) + ms
+
+    def to_json(self) -> str:
+        return json.dumps({"kind": self.kind, "context": self.context, "start": self.start, "latency_ms": round(self.latency_ms, 3),
+                           "counters": dict(self.counters), "phases_ms": {phase: round(ms, 3) for phase, ms in self.phases_ms.items()}},
+                          default=str)
+
+
+class LatencyHistogram:
+    """Latencies of the last `window` turns: percentiles and counts per power-of-two millisecond bucket."""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW) -> None:
+        self.latencies: deque[float] = deque(maxlen=window)
+
+    def add(self, latency_ms: float) -> None:
+        self.latencies.append(latency_ms)
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return math.nan
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def buckets(self) -> dict[str, int]:
+        """Turns per latency bucket, "<1ms", "1-2ms", "2-4ms" and so on."""
+        counts = Counter(0 if latency < 1 else int(math.log2(latency)) + 1 for latency in self.latencies)
+        return {("<1ms" if bucket == 0 else f"{2 ** (bucket - 1)}-{2 ** bucket}ms"): counts[bucket] for bucket in sorted(counts)}
+
+    def summary(self) -> str:
+        return (f"{len(self.latencies)} turns, p50 {self.percentile(50):.1f}ms, p90 {self.percentile(90):.1f}ms, "
+                f"p99 {self.percentile(99):.1f}ms, max {max(self.latencies, default=math.nan):.1f}ms")
+
+
+class Recorder:
+    def __init__(self, out: IO[str] | None = None, window: int = HISTOGRAM_WINDOW) -> None:
+        self.out        = out
+        self.current: TurnRecord | None = None
+        self.histograms: defaultdict[str, LatencyHistogram] = defaultdict(lambda: LatencyHistogram(window))
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if self.current is not None:
+            self.current.counters[name] += amount
+
+    @contextmanager
+    def turn(self, kind: str, **context) -> Iterator[TurnRecord]:
+        outer        = self.current
+        record       = self.current = TurnRecord(kind, context)
+        start        = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.latency_ms = 1000 * (time.perf_counter() - start)
+            self.current      = outer
+            self._finish(record)
+
+    def record(self, kind: str, latency_ms: float, parts: Iterable[TurnRecord | None] = (), **context) -> TurnRecord:
+        """Records a turn whose search ran in worker processes: the latency measured here, and the counters
+        and phase times of the `parts` the workers sent back, phase times summed over the workers."""
+        record            = TurnRecord(kind, context)
+        record.latency_ms = latency_ms
+        for part in parts:
+            if part is not None:
+                record.merge(part)
+        self._finish(record)
+        return record
+
+    def _finish(self, record: TurnRecord) -> None:
+        self.histograms[record.kind].add(record.latency_ms)
+        if self.out is not None:
+            self.out.write(record.to_json() + "\n")
+            self.out.flush()
+
+
+_recorder: Recorder | None = None
+
+
+def enable(path: str | None = None, window: int = HISTOGRAM_WINDOW) -> Recorder:
+    """Starts recording; turns are appended to `path` as JSON lines when given."""
+    global _recorder
+    _recorder = Recorder(open(path, "a") if path else None, window)
+    return _recorder
+
+
+def disable() -> None:
+    global _recorder
+    if _recorder is not None and _recorder.out is not None:
+        _recorder.out.close()
+    _recorder = None
+
+
+def recorder() -> Recorder | None:
+    return _recorder
+
+
+def turn(kind: str, **context):
+    """Context manager around one turn's move search; does nothing while instrumentation is off."""
+    return _recorder.turn(kind, **context) if _recorder is not None else nullcontext()
+
+
+def record(kind: str, latency_ms: float, parts: Iterable[TurnRecord | None] = (), **context) -> None:
+    """Records a turn searched in the background; does nothing while instrumentation is off."""
+    if _recorder is not None:
+        _recorder.record(kind, latency_ms, parts, **context)
+
+
+def worker_turn(kind: str, instrumented: bool):
+    """`turn` for a worker process's part of a search: with `instrumented` set, it is recorded by the
+    worker's own recorder (enabled on first use, writing nowhere) and the record is yielded to send back
+    to the parent; otherwise nothing is measured and None is yielded."""
+    if not instrumented:
+        return nullcontext()
+    return (_recorder or enable()).turn(kind)
+
+
+def attach(solver: object) -> None:
+    """Installs counting and timing wrappers on `solver` when a turn is being recorded."""
+    record = _recorder.current if _recorder is not None else None
+    if record is None:
+        return
+    for name in COUNTED_METHODS.keys() | TIMED_METHODS.keys():
+        method = getattr(solver, name, None)
+        if method is not None:
+            setattr(solver, name, _wrap(method, record, COUNTED_METHODS.get(name), TIMED_METHODS.get(name)))
+    rejections = getattr(solver, "rejections", None)
+    if rejections is not None:
+        for name in REJECTING_METHODS:
+            setattr(solver, name, _count_rejections(getattr(solver, name), name, rejections, record))
+
+
+def _count_rejections(method: Callable[..., Any], name: str, rejections: Callable[[str, tuple[Any, ...]], tuple[int, int]],
+                      record: TurnRecord) -> Callable[..., Any]:
+    @functools.wraps(method)
+    def counted(*args):
+        result            = method(*args)
+        misses, ruled_out = rejections(name, args)
+        record.counters["lexicon_misses"]     += misses
+        record.counters["cross_check_misses"] += ruled_out
+        return result
+    return counted
+
+
+def _wrap(method: Callable[..., Any], record: TurnRecord, counter: str | None, phase: str | None) -> Callable[..., Any]:
+    if phase is None:
+        @functools.wraps(method)
+        def counted(*args, **kwargs):
+            record.counters[counter] += 1
+            return method(*args, **kwargs)
+        return counted
+
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        if counter:
+            record.counters[counter] += 1
+        record.nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            record.add_time(phase, elapsed - record.nested.pop())
+            if record.nested:
+                record.nested[-1] += elapsed
+    return timed
+
+
+def validation(function: F) -> F:
+    """Decorator for `word_score`: records each check of a typed word as a "validation" turn counting the
+    words it checks ("validated"), crossing words included, and turns down ("rejected")."""
+    @functools.wraps(function)
+    def counted(*args, **kwargs):
+        if _recorder is None:
+            return function(*args, **kwargs)
+        with nullcontext() if _recorder.current is not None else _recorder.turn("validation"):
+            result = function(*args, **kwargs)
+            _recorder.count("validated")
+            if result.is_err():
+                _recorder.count("rejected")
+        return result
+    return cast(F, counted)
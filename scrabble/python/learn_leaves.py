@@ -0,0 +1,105 @@
+# Learns the leave table of `leaves.py` from greedy self-play.
+#
+# The value of a leave is how much more than average its player scored on their next turn. Leaves
+# seen only a few times are shrunk towards the sum of the values of their single tiles, so every
+# entry of the table gets a sensible value however many games were played.
+
+import argparse
+import itertools as it
+import math
+import os
+from array import array
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import leaves
+import lexicon
+from engine import Game, greedy
+from leaves import MAX_LEAVE, SLOTS, TABLE_SIZE, LeaveTable, leave_index
+from solver import SLOT_TILES
+
+PRIOR_SAMPLES = 50  # samples a leave needs before its own average outweighs the single-tile estimate
+BATCH_SIZE    = 25
+
+Sums = dict[str, list[float]]  # per leave: [total next-turn score, samples]
+
+
+def collect(lexicon: lexicon.Gaddag, seeds: Iterable[int]) -> Sums:
+    """Plays greedy games and adds up, per leave, what its player scored on their next turn.
+
+    Only plays made while there were tiles left to draw count; after that the leave is the endgame."""
+    sums: Sums = defaultdict(lambda: [0.0, 0])
+    for seed in seeds:
+        game    = Game(lexicon, seed, seed % 2)
+        pending: list[str | None] = [None, None]  # the last leave of each player, waiting for their next score
+        while not game.is_over():
+            player, play = game.turn, greedy(game)
+            leave        = pending[player]
+            if leave is not None:
+                totals     = sums[leave]
+                totals[0] += play.score if play else 0
+                totals[1] += 1
+            pending[player] = play.leave if play and play.leave and game.bag else None
+            game.apply(play)
+    return dict(sums)
+
+
+def _collect_batch(seeds: Sequence[int]) -> Sums:
+    return collect(lexicon.attached(), seeds)
+
+
+def fit(sums: Sums, prior: int = PRIOR_SAMPLES) -> LeaveTable:
+    """Turns next-turn score totals into a value for every leave."""
+    samples = sum(count for _, count in sums.values())
+    average = sum(total for total, _ in sums.values()) / samples
+
+    # single-tile values: least-squares fit of each leave's advantage as a sum over its tiles
+    counts, advantages, weights = [], [], []
+    for leave, (total, count) in sums.items():
+        counts.append([leave.count(tile) for tile in SLOT_TILES])
+        advantages.append(total / count - average)
+        weights.append(math.sqrt(count))
+    weighting   = np.array(weights)
+    tile_values = np.linalg.lstsq(np.array(counts) * weighting[:, None], np.array(advantages) * weighting, rcond=None)[0].tolist()
+
+    values = array("f", bytes(4 * TABLE_SIZE))
+    for size in range(1, MAX_LEAVE + 1):
+        for slots in it.combinations_with_replacement(range(SLOTS), size):
+            estimate = sum(tile_values[slot] for slot in slots)
+            total, count = sums.get("".join(SLOT_TILES[slot] for slot in slots), (0.0, 0))
+            values[leave_index(slots)] = (total - count * average + prior * estimate) / (count + prior)
+    return LeaveTable(values)
+
+
+def learn(path: str, games: int, seed: int = 0, workers: int | None = None) -> LeaveTable:
+    """Collects `games` greedy self-play games on the GADDAG at `path` over a process pool and fits a table."""
+    workers = workers or os.cpu_count() or 1
+    sums: Sums = defaultdict(lambda: [0.0, 0])
+    with ProcessPoolExecutor(workers, initializer=lexicon.attach, initargs=(path,)) as executor:
+        batches = [range(start, min(start + BATCH_SIZE, seed + games)) for start in range(seed, seed + games, BATCH_SIZE)]
+        for batch in executor.map(_collect_batch, batches):
+            for leave, (total, count) in batch.items():
+                sums[leave][0] += total
+                sums[leave][1] += count
+    return fit(sums)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Learn rack leave values from greedy self-play")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--lexicon", help="compiled GADDAG to use instead of NWL2020")
+    parser.add_argument("--out", default=leaves.NWL_2020_LEAVES)
+    args = parser.parse_args()
+
+    path = args.lexicon or lexicon.nwl_2020(gaddag=True).path
+    assert path is not None  # a loaded lexicon knows its file
+    learn(path, args.games, args.seed, args.workers).save(args.out)
+
+
+if __name__ == "__main__":
+    main()
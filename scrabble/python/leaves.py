@@ -0,0 +1,101 @@
+# Rack leave values: how much the tiles kept after a play are worth, learned by `learn_leaves.py`.
+#
+# A leave is the multiset of 1-6 tiles kept after a play. Every possible leave (over the 26 letters
+# and the blank) has a fixed index given by the combinatorial number system, so the table is one
+# flat float32 array and a lookup only sorts the leave and adds up a few binomials.
+
+import itertools as it
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Iterable, Sequence
+from functools import cache
+
+from board import Letter
+from scoring import Play
+from solver import LETTER_SLOTS, SLOT_TILES
+
+MAX_LEAVE = 6
+SLOTS     = len(SLOT_TILES)
+
+NWL_2020_LEAVES = "../dictionary/nwl_2020.leaves"
+
+# Binary layout (little endian): header (magic, format version, max leave size), then float32 * TABLE_SIZE
+LEAVES_MAGIC   = b"HSLV"
+LEAVES_VERSION = 1
+_HEADER        = struct.Struct("<4sHH")
+
+# _BINOMIAL[n][k] = C(n, k), and _OFFSETS[k] = index of the first leave of size k
+_BINOMIAL  = [[math.comb(n, k) for k in range(MAX_LEAVE + 1)] for n in range(SLOTS + MAX_LEAVE)]
+_OFFSETS   = list(it.accumulate((math.comb(SLOTS + k - 1, k) for k in range(MAX_LEAVE + 1)), initial=0))
+TABLE_SIZE = _OFFSETS[-1]
+
+
+def leave_index(slots: Sequence[int]) -> int:
+    """Index of the leave with these (sorted) rack slots: its rank among leaves of the same size, after the smaller ones."""
+    index = _OFFSETS[len(slots)]
+    for i, slot in enumerate(slots):
+        index += _BINOMIAL[slot + i][i + 1]
+    return index
+
+
+class LeaveTable:
+    _mmap: mmap.mmap | None = None  # mapping of the file the values were loaded from, kept alive as long as they are
+
+    def __init__(self, values: Sequence[float]) -> None:
+        self._values = values
+
+    def value(self, leave: Iterable[Letter]) -> float:
+        slots = sorted(LETTER_SLOTS[tile] for tile in leave)
+        if len(slots) > MAX_LEAVE:
+            return 0.0
+        return self._values[leave_index(slots)]
+
+    def equity(self, play: Play) -> float:
+        """Score of a generator play plus the value of the tiles it keeps."""
+        return play.score + self.value(play.leave)
+
+    def rank(self, plays: Iterable[Play]) -> list[Play]:
+        """`plays` in increasing equity, like the increasing score order of `sorted(plays)`."""
+        return sorted(plays, key=self.equity)
+
+    def save(self, path: str) -> None:
+        values = array("f", self._values)
+        if sys.byteorder != "little":
+            values.byteswap()
+        with open(path, "wb") as file:
+            file.write(_HEADER.pack(LEAVES_MAGIC, LEAVES_VERSION, MAX_LEAVE))
+            file.write(values.tobytes())
+
+
+def load(path: str) -> LeaveTable:
+    """Memory-maps a table written by `LeaveTable.save`."""
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, max_leave = _HEADER.unpack_from(buffer)
+    if magic != LEAVES_MAGIC:
+        raise ValueError(f"{path} is not a leave table")
+    if version != LEAVES_VERSION or max_leave != MAX_LEAVE:
+        raise ValueError(f"{path} has leave table format version {version}, expected {LEAVES_VERSION}")
+    values: Sequence[float] = memoryview(buffer)[_HEADER.size:_HEADER.size + 4 * TABLE_SIZE].cast("f")
+    if sys.byteorder != "little":
+        values = array("f", values)
+        values.byteswap()
+    table       = LeaveTable(values)
+    table._mmap = buffer
+    return table
+
+
+@cache
+def shared(path: str) -> LeaveTable:
+    """`load`, once per process; for worker processes handed the path of a table."""
+    return load(path)
+
+
+def nwl_2020() -> LeaveTable:
+    if not os.path.exists(NWL_2020_LEAVES):
+        raise FileNotFoundError(f"{NWL_2020_LEAVES} does not exist; learn it with `python3 learn_leaves.py`")
+    return load(NWL_2020_LEAVES)
@@ -0,0 +1,358 @@
+# Minimized DAWG / GADDAG lexicons stored in flat arrays.
+#
+# The tree is built with Daciuk's incremental algorithm for sorted input (equivalent suffixes
+# are shared), then flattened into four arrays indexed by node id. Nodes handed out to the
+# solver are thin views over those arrays that expose the same `is_word` / `children` access
+# as `trie.TrieNode`, so `SolverState` can walk either structure. Views are not kept: only the
+# `children` dicts of the most recently used nodes are, so memory stays flat however much of
+# the lexicon is walked.
+
+import argparse
+import functools
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Literal, overload
+
+GADDAG_SEP = "+"  # separates the reversed prefix from the suffix in GADDAG paths
+
+# Binary lexicon layout (little endian):
+#   header      magic, format version, kind (0 = DAWG, 1 = GADDAG), node count, edge count
+#   first_edge  uint32 * (nodes + 1)
+#   targets     uint32 * edges
+#   terminal    uint8  * nodes
+#   letters     uint8  * edges
+LEXICON_MAGIC   = b"HSLX"
+LEXICON_VERSION = 1
+_HEADER         = struct.Struct("<4sHH2I")
+
+CHILDREN_CACHE_SIZE = 4096   # nodes whose `children` dict is kept, least recently used dropped first
+HOOK_CACHE_SIZE     = 16384  # fragment pairs whose hook mask is kept, least recently used dropped first
+_BYTES              = [bytes((code,)) for code in range(256)]
+
+
+class _BuildNode:
+    __slots__ = ("final", "edges", "id")
+
+    def __init__(self, id: int) -> None:
+        self.final = False
+        self.edges: dict[str, _BuildNode] = {}
+        self.id = id
+
+    def signature(self) -> tuple[bool, tuple[tuple[str, int], ...]]:
+        return (self.final, tuple((letter, node.id) for letter, node in sorted(self.edges.items())))
+
+
+def _build(strings: Iterable[str]) -> tuple[bytearray, "array[int]", bytes, "array[int]"]:
+    """Builds a minimal acyclic automaton from lexicographically sorted strings and flattens it."""
+    next_id = 0
+
+    def new_node() -> _BuildNode:
+        nonlocal next_id
+        next_id += 1
+        return _BuildNode(next_id - 1)
+
+    root = new_node()
+    register: dict[tuple[bool, tuple[tuple[str, int], ...]], _BuildNode] = {}
+    unchecked: list[tuple[_BuildNode, str, _BuildNode]] = []
+
+    def minimize(down_to: int) -> None:
+        while len(unchecked) > down_to:
+            parent, letter, child = unchecked.pop()
+            key = child.signature()
+            if key in register:
+                parent.edges[letter] = register[key]
+            else:
+                register[key] = child
+
+    previous = ""
+    for word in strings:
+        if word == previous:
+            continue
+        common = 0
+        for a, b in zip(word, previous):
+            if a != b:
+                break
+            common += 1
+        minimize(common)
+        node = unchecked[-1][2] if unchecked else root
+        for letter in word[common:]:
+            child = new_node()
+            node.edges[letter] = child
+            unchecked.append((node, letter, child))
+            node = child
+        node.final = True
+        previous = word
+    minimize(0)
+
+    # Renumber the surviving nodes breadth first so the root is node 0
+    order = [root]
+    index = {id(root): 0}
+    for node in order:
+        for _, child in sorted(node.edges.items()):
+            if id(child) not in index:
+                index[id(child)] = len(order)
+                order.append(child)
+
+    terminal    = bytearray(len(order))
+    first_edge  = array("I", [0])
+    letters     = bytearray()
+    targets     = array("I")
+    for i, node in enumerate(order):
+        terminal[i] = node.final
+        for letter, child in sorted(node.edges.items()):
+            letters.append(ord(letter))
+            targets.append(index[id(child)])
+        first_edge.append(len(targets))
+    return terminal, first_edge, bytes(letters), targets
+
+
+class DawgNode:
+    """View of one lexicon node; its edges are read from the lexicon's arrays."""
+    __slots__ = ("_lexicon", "_index", "is_word")
+
+    def __init__(self, lexicon: "Dawg", index: int) -> None:
+        self._lexicon = lexicon
+        self._index   = index
+        self.is_word  = bool(lexicon._terminal[index])
+
+    @property
+    def children(self) -> dict[str, "DawgNode"]:
+        return self._lexicon._children(self._index)
+
+
+class Dawg:
+    path:        str | None = None  # file the lexicon was loaded from, if any
+    _mmap:       mmap.mmap | None = None  # mapping of that file, kept alive as long as the arrays viewing it
+    _terminal:   Sequence[int]
+    _first_edge: Sequence[int]
+    _letters:    Sequence[int]
+    _targets:    Sequence[int]
+    _letter_data: bytes | mmap.mmap  # holds the letters array, from `_letter_base` on, for `find`
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self._set_arrays(*_build(sorted(words)))
+
+    def _set_arrays(self, terminal, first_edge, letters, targets, letter_data=None, letter_base: int = 0) -> None:
+        self._terminal    = terminal
+        self._first_edge  = first_edge
+        self._letters     = letters
+        self._targets     = targets
+        self._letter_data = letters if letter_data is None else letter_data
+        self._letter_base = letter_base
+        self._children    = functools.lru_cache(maxsize=CHILDREN_CACHE_SIZE)(self._edges)
+        self._hook_masks  = functools.lru_cache(maxsize=HOOK_CACHE_SIZE)(self._find_hooks)
+        self.root = DawgNode(self, 0)
+
+    def save(self, path: str) -> None:
+        kind = 1 if isinstance(self, Gaddag) else 0
+        first_edge, targets = array("I", self._first_edge), array("I", self._targets)
+        if sys.byteorder != "little":
+            first_edge.byteswap()
+            targets.byteswap()
+        with open(path, "wb") as file:
+            file.write(_HEADER.pack(LEXICON_MAGIC, LEXICON_VERSION, kind, len(self._terminal), len(self._targets)))
+            file.write(first_edge.tobytes())
+            file.write(targets.tobytes())
+            file.write(bytes(self._terminal))
+            file.write(bytes(self._letters))
+
+    def __len__(self) -> int:
+        return len(self._terminal)
+
+    def arrays(self) -> tuple[Sequence[int], Sequence[int], Sequence[int], Sequence[int]]:
+        """First edge of each node, edge letter codes, edge targets and terminal flags, for walkers
+        that follow node ids rather than `DawgNode` views."""
+        return self._first_edge, self._letters, self._targets, self._terminal
+
+    def edges(self, index: int) -> Iterator[tuple[int, int]]:
+        """(letter code, target node) of every edge leaving node `index`, in letter order."""
+        for edge in range(self._first_edge[index], self._first_edge[index + 1]):
+            yield self._letters[edge], self._targets[edge]
+
+    def child(self, index: int, code: int) -> int:
+        """Node reached from node `index` over the letter with code `code`, -1 if there is none."""
+        base = self._letter_base
+        edge = self._letter_data.find(_BYTES[code], base + self._first_edge[index], base + self._first_edge[index + 1])
+        return -1 if edge < 0 else self._targets[edge - base]
+
+    def walk(self, index: int, letters: str) -> int:
+        """Node reached from node `index` over `letters`, -1 if they fall off the lexicon."""
+        for letter in letters:
+            index = self.child(index, ord(letter))
+            if index < 0:
+                break
+        return index
+
+    def _edges(self, index: int) -> dict[str, DawgNode]:
+        return {chr(code): DawgNode(self, target) for code, target in self.edges(index)}
+
+    def lookup(self, word: str) -> DawgNode | None:
+        index = self.walk(0, word)
+        return DawgNode(self, index) if index >= 0 else None
+
+    def is_word(self, word: str) -> bool:
+        index = self.walk(0, word)
+        return index >= 0 and bool(self._terminal[index])
+
+    def hook_mask(self, before: str, after: str) -> int:
+        """Letters (bit i for the i-th letter of the alphabet) that make `before + letter + after` a word.
+
+        The masks of the most recently used fragment pairs are kept, since the same fragments come up
+        again and again; the others are looked up again."""
+        return self._hook_masks(before, after)
+
+    def _find_hooks(self, before: str, after: str) -> int:
+        index = self.walk(0, before)
+        return _hooks(self, self.edges(index), after) if index >= 0 else 0
+
+
+def _hooks(lexicon: Dawg, edges: Iterable[tuple[int, int]], after: str) -> int:
+    """Mask of the edge letters from which `after` leads to the end of a word."""
+    mask = 0
+    for code, index in edges:
+        if ord("A") <= code <= ord("Z"):
+            index = lexicon.walk(index, after)
+            if index >= 0 and lexicon._terminal[index]:
+                mask |= 1 << (code - ord("A"))
+    return mask
+
+
+def gaddag_paths(word: str) -> list[str]:
+    """All GADDAG paths of a word: rev(word[:i]) + SEP + word[i:] for every non-empty prefix."""
+    return [word[i - 1::-1] + GADDAG_SEP + word[i:] for i in range(1, len(word) + 1)]
+
+
+class Gaddag(Dawg):
+    """Minimized GADDAG; a path is read leftwards from any letter of a word, then rightwards after SEP."""
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self._set_arrays(*_build(sorted(path for word in words for path in gaddag_paths(word))))
+
+    def is_word(self, word: str) -> bool:
+        return super().is_word(word[::-1] + GADDAG_SEP)
+
+    def _find_hooks(self, before: str, after: str) -> int:
+        if before:  # rev(before) + SEP, then the hook and the rest of the word
+            index = self.walk(0, before[::-1] + GADDAG_SEP)
+            return _hooks(self, self.edges(index), after) if index >= 0 else 0
+        # the word starts with the hook: hook + SEP + after
+        return _hooks(self, ((code, self.child(target, ord(GADDAG_SEP))) for code, target in self.edges(0)
+                             if self.child(target, ord(GADDAG_SEP)) >= 0), after)
+
+
+def load(path: str) -> Dawg:
+    """Memory-maps a lexicon written by `Dawg.save`; nodes are read straight from the shared page cache."""
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, kind, nodes, edges = _HEADER.unpack_from(buffer)
+    if magic != LEXICON_MAGIC:
+        raise ValueError(f"{path} is not a lexicon file")
+    if version != LEXICON_VERSION:
+        raise ValueError(f"{path} has lexicon format version {version}, expected {LEXICON_VERSION}")
+
+    view   = memoryview(buffer)
+    offset = _HEADER.size
+    def take(count: int, format: Literal["I", "B"]) -> Sequence[int]:
+        nonlocal offset
+        size   = count * struct.calcsize(format)
+        chunk  = view[offset:offset + size].cast(format)
+        offset += size
+        if format == "I" and sys.byteorder != "little":
+            swapped = array("I", chunk)
+            swapped.byteswap()
+            return swapped
+        return chunk
+
+    first_edge   = take(nodes + 1, "I")
+    targets      = take(edges, "I")
+    terminal     = take(nodes, "B")
+    letters_base = offset
+    letters      = take(edges, "B")
+
+    cls     = Gaddag if kind == 1 else Dawg
+    lexicon = cls.__new__(cls)
+    lexicon._mmap = buffer
+    lexicon.path  = path
+    lexicon._set_arrays(terminal, first_edge, letters, targets, buffer, letters_base)
+    return lexicon
+
+
+def load_gaddag(path: str) -> Gaddag:
+    """`load` for callers that generate moves, which need the lexicon at `path` to be a GADDAG."""
+    lexicon = load(path)
+    if not isinstance(lexicon, Gaddag):
+        raise ValueError(f"{path} is a DAWG, not a GADDAG")
+    return lexicon
+
+
+_attached: Gaddag | None = None  # GADDAG of a worker process, see `attach`
+
+
+def attach(path: str) -> None:
+    """Process pool initializer: every worker maps the GADDAG at `path` once, sharing the page cache."""
+    global _attached
+    _attached = load_gaddag(path)
+
+
+def attached() -> Gaddag:
+    assert _attached is not None, "not in a worker started with initializer=lexicon.attach"
+    return _attached
+
+
+def load_words(path: str) -> list[str]:
+    """Reads a word list, skipping headers and keeping only the first token of each line (definitions follow it)."""
+    words = []
+    with open(path) as file:
+        for line in file:
+            tokens = line.split()
+            if tokens and tokens[0].isalpha() and tokens[0].isupper():
+                words.append(tokens[0])
+    return words
+
+
+def compile_lexicon(word_list: str, path: str, gaddag: bool = False) -> None:
+    words = load_words(word_list)
+    (Gaddag(words) if gaddag else Dawg(words)).save(path)
+
+
+@overload
+def load_or_compile(word_list: str, gaddag: Literal[False] = False) -> Dawg: ...
+@overload
+def load_or_compile(word_list: str, gaddag: Literal[True]) -> Gaddag: ...
+@overload
+def load_or_compile(word_list: str, gaddag: bool) -> Dawg: ...
+def load_or_compile(word_list: str, gaddag: bool = False) -> Dawg:
+    """Loads the prebuilt lexicon next to `word_list`, (re)compiling it first if missing or stale."""
+    path = os.path.splitext(word_list)[0] + (".gaddag" if gaddag else ".dawg")
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(word_list):
+        compile_lexicon(word_list, path, gaddag)
+    try:
+        return load(path)
+    except ValueError:  # written by an older format version
+        compile_lexicon(word_list, path, gaddag)
+        return load(path)
+
+
+@overload
+def nwl_2020(gaddag: Literal[False] = False) -> Dawg: ...
+@overload
+def nwl_2020(gaddag: Literal[True]) -> Gaddag: ...
+def nwl_2020(gaddag: bool = False) -> Dawg:
+    return load_or_compile("../dictionary/nwl_2020.txt", gaddag)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile a word list into a binary lexicon file")
+    parser.add_argument("word_list")
+    parser.add_argument("output")
+    parser.add_argument("--gaddag", action="store_true", help="build a GADDAG instead of a DAWG")
+    args = parser.parse_args()
+    compile_lexicon(args.word_list, args.output, args.gaddag)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,23 +4,32 @@ HookStar Scrabble Trainer
 Started from https://arcade.academy/examples/array_backed_grid.html#array-backed-grid
 """
 
+import argparse
 import os
 import random
 import sys
 import textwrap
+import time
 from collections import defaultdict
-from dataclasses import dataclass
 from enum import Enum
 from tkinter import Tk, messagebox
 
 import arcade
 from colorama import Fore, Style, init
 from numpy import sign
-from result import Err, Ok
+from result import Err
 
+import instrument
+import leaves
+from analysis import BoardAnalysis
 from board import Board, CellCoord, Direction, Letter, Position
-from solver import CellCoord, SolverState
-from trie import nwl_2020
+from leaves import NWL_2020_LEAVES
+from lexicon import nwl_2020
+from parallel import ParallelSolver
+from render import Emojis, Region
+from scoring import BOARD, TILE_BAG, TILE_SCORE, Tl, deltas, prefix_tiles, word_score
+from simulate import Simulator
+from solver import CellCoord, PlayCache
 
 Color = tuple[int, int, int]
 
@@ -43,6 +52,9 @@ RIGHT_MARGIN  = 750
 
 FONT = "consolas"
 
+SIMULATION_CANDIDATES = 10    # top plays simulated when pressing TAB while pausing for analysis
+ENDGAME_TIME_BUDGET   = 10.0  # seconds the computer may think once the bag is empty
+
 SCREEN_WIDTH  = (WIDTH + MARGIN)  * COLUMN_COUNT + MARGIN + RIGHT_MARGIN
 SCREEN_HEIGHT = (HEIGHT + MARGIN) * ROW_COUNT    + MARGIN + BOTTOM_MARGIN
 SCREEN_TITLE  = "HookStar 🏴‍☠️⭐"
@@ -51,40 +63,6 @@ FONT_SIZE         = 30
 HORIZ_TEXT_OFFSET = 13
 VERT_TEXT_OFFSET  = 15
 
-class Tl(Enum):
-    NO = 1
-    DL = 2
-    DW = 3
-    TL = 4
-    TW = 5
-
-BOARD = [[Tl.TW, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.TW, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.TW],
-         [Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO],
-         [Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO],
-         [Tl.DL, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.DL],
-         [Tl.NO, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.NO],
-         [Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO],
-         [Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO],
-         [Tl.TW, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.TW],
-         [Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO],
-         [Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO],
-         [Tl.NO, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.NO],
-         [Tl.DL, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.DL],
-         [Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO, Tl.NO],
-         [Tl.NO, Tl.DW, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.TL, Tl.NO, Tl.NO, Tl.NO, Tl.DW, Tl.NO],
-         [Tl.TW, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.NO, Tl.TW, Tl.NO, Tl.NO, Tl.NO, Tl.DL, Tl.NO, Tl.NO, Tl.TW]]
-
-TILE_SCORE = {
-    "A": 1, "B": 3, "C": 3, "D": 2, "E": 1, "F": 4,  "G": 2,  "H": 4, "I": 1, "J": 8 ,
-    "K": 5, "L": 1, "M": 3, "N": 1, "O": 1, "P": 3,  "Q": 10, "R": 1, "S": 1, "T": 1,
-    "U": 1, "V": 4, "W": 4, "X": 8, "Y": 4, "Z": 10, " ": 0 }
-
-TILE_BAG = \
-    ["A"] * 9 + ["B"] * 2 + ["C"] * 2 + ["D"] * 4 + ["E"] * 12 + ["F"] * 2 + ["G"] * 3 + \
-    ["H"] * 2 + ["I"] * 9 + ["J"] * 1 + ["K"] * 1 + ["L"] * 4  + ["M"] * 2 + ["N"] * 6 + \
-    ["O"] * 8 + ["P"] * 2 + ["Q"] * 1 + ["R"] * 6 + ["S"] * 4  + ["T"] * 6 + ["U"] * 4 + \
-    ["V"] * 2 + ["W"] * 2 + ["X"] * 1 + ["Y"] * 2 + ["Z"] * 1  + [" "] * 2
-
 LR_ARROW_KEYS = [arcade.key.LEFT, arcade.key.RIGHT]
 UD_ARROW_KEYS = [arcade.key.UP, arcade.key.DOWN]
 ARROW_KEYS    = LR_ARROW_KEYS + UD_ARROW_KEYS
@@ -120,10 +98,6 @@ class Hooks(Enum):
     ALL     = 1
     ON_RACK = 2
 
-class Extension(Enum):
-    PREFIX = 1
-    SUFFIX = 2
-
 class Phase(Enum):
     PLAYERS_TURN       = 1
     PAUSE_FOR_ANALYSIS = 2
@@ -131,14 +105,6 @@ class Phase(Enum):
     FINAL_SCORE        = 4
     EXIT               = 5
 
-@dataclass(frozen=True, order=True)
-class Play:
-    score:    int
-    word:     str
-    pos:      Position
-    is_bingo: bool
-    blanks:   set[CellCoord]
-
 class Cursor:
     x: int
     y: int
@@ -170,16 +136,6 @@ def word_wrap_split(text: str, line_length: int):
     wrapper = textwrap.TextWrapper(width=line_length)
     return wrapper.wrap(text)
 
-def letter_multiplier(row: int, col: int) -> int:
-    if BOARD[row][col] == Tl.DL: return 2
-    if BOARD[row][col] == Tl.TL: return 3
-    return 1
-
-def word_multiplier(row: int, col: int) -> int:
-    if BOARD[row][col] == Tl.DW: return 2
-    if BOARD[row][col] == Tl.TW: return 3
-    return 1
-
 def tile_color(pos: CellCoord) -> Color:
     row, col = pos
     if BOARD[row][col] == Tl.DL: return COLOR_DOUBLE_LETTER
@@ -188,119 +144,6 @@ def tile_color(pos: CellCoord) -> Color:
     if BOARD[row][col] == Tl.TW: return COLOR_TRIPLE_WORD
     return COLOR_NORMAL
 
-def deltas(dir) -> tuple[int, int]:
-    row_delta = 1 if dir == Direction.DOWN else 0
-    col_delta = 0 if dir == Direction.DOWN else 1
-    return (row_delta, col_delta)
-
-def extension_tiles(ext, board, dir, row, col, blank_poss):
-    delta_factor         = -1 if ext == Extension.PREFIX else 1
-    row_delta, col_delta = tuple(delta_factor * i for i in list(deltas(dir)))
-    next_row, next_col, tiles, score = row, col, "", 0
-    while True:
-        next_row += row_delta
-        next_col += col_delta
-        pos = (next_row, next_col)
-        if board.is_filled(pos):
-            tiles += board.tile(pos)
-            if (14 - next_row, next_col) not in blank_poss:
-                score += TILE_SCORE.get(board.tile(pos))
-        else:
-            break
-    return (tiles[::delta_factor], score)
-
-def prefix_tiles(board, dir, row, col, blank_poss):
-    return extension_tiles(Extension.PREFIX, board, dir, row, col, blank_poss)
-
-def suffix_tiles(board, dir, row, col, blank_poss):
-    return extension_tiles(Extension.SUFFIX, board, dir, row, col, blank_poss)
-
-def word_score(board, dictionary, letters, pos, first_call, blank_poss):
-    dir, row, col = pos.dir, 14 - pos.row, pos.col
-    if board.is_filled((row, col)):
-        return Err("cannot start word on existing tile")
-    rest_of_row = board._tiles[row][col:] if dir == Direction.ACROSS else list(zip(*board._tiles))[col][row:]
-    if len([1 for c in rest_of_row if c == "."]) < len(letters):
-        return Err("outside of board")
-
-    word_played, score   = prefix_tiles(board, dir, row, col, blank_poss)
-    has_prefix           = len(word_played) > 0
-    word_mult            = 1
-    row_delta, col_delta = deltas(dir)
-    crosses              = len(word_played) > 0
-    valid_start          = False
-    blanks               = set()
-    letters_played       = 0
-
-    perpandicular_words = []
-
-    for letter in letters:
-        while board.is_filled((row, col)):
-            word_played = word_played + board.tile((row, col))
-            if (14 - row, col) not in blank_poss:
-                score  += TILE_SCORE.get(board.tile((row, col)))
-            row        += row_delta
-            col        += col_delta
-            crosses     = True
-        letters_played += 1
-        word_played    += letter
-        word_mult      *= word_multiplier(row, col)
-        if (14 - row, col) not in blank_poss:
-            score += TILE_SCORE.get(letter) * letter_multiplier(row, col)
-        else:
-            blanks.add((14 - row, col))
-        if len(letters) == 1:
-            one_letter_score = TILE_SCORE.get(letter) * letter_multiplier(row, col)
-
-        # find perpendicular words that need to be scored
-        if dir == Direction.ACROSS:
-            if board.is_filled((row + 1, col)) or board.is_filled((row - 1, col)):
-                perpandicular_words.append((letter, (row, col)))
-        else:
-            if board.is_filled((row, col + 1)) or board.is_filled((row, col - 1)):
-                perpandicular_words.append((letter, (row, col)))
-        if row * col == 49:
-            valid_start = True
-        row += row_delta
-        col += col_delta
-
-    suffix, suffix_score = suffix_tiles(board, dir, row - row_delta, col - col_delta, blank_poss)
-    word_played         += suffix
-    has_suffix           = len(suffix) > 0
-
-    score += suffix_score
-
-    if not has_prefix and not has_suffix and len(letters) == 1:
-        score -= one_letter_score
-
-    score *= word_mult
-    score += 50 if len(letters) == 7 else 0
-
-    if not crosses and len(suffix) == 0 and len(perpandicular_words) == 0 and first_call:
-        if board.is_first_turn():
-            if not valid_start:
-                return Err("first move must be through center tile")
-        else:
-            return Err("does not overlap with any other word")
-
-    if first_call:
-        opposite_dir = Direction.ACROSS if dir == Direction.DOWN else Direction.DOWN
-        for word, (r, c) in perpandicular_words:
-            new_pos = Position(opposite_dir, 14-r, c)
-            potential_play = word_score(board, dictionary, word, new_pos, False, blank_poss)
-            if potential_play.is_ok():
-                play = potential_play.unwrap()
-                score += play.score
-                if len(word_played) == 1:
-                    word_played = play.word
-            else:
-                return potential_play
-
-    if not dictionary.is_word(word_played) and not (len(word_played) == 1 and len(perpandicular_words)):
-        return Err(f"{word_played} not in dictionary")
-
-    return Ok(Play(score, word_played, pos, letters_played == 7, blanks))
-
 class MyGame(arcade.Window):
     """Main application class"""
     grid: Board
@@ -333,12 +176,15 @@ class MyGame(arcade.Window):
         self.phase                   = Phase.PLAYERS_TURN
         self.pause_for_analysis_rank = None
         self.player_plays            = []
+        self.player_plays_version    = 0     # bumped whenever `player_plays` changes, for the top words' key
         self.filtered_player_plays   = []
         self.player_words_found      = set() # by rank
+        self.player_plays_typed      = []    # valid plays typed this turn, ranked again as more plays come in
         self.player_scores_found     = set()
         self.player_current_play     = Err("no play yet")
 
         self.hook_letters         = defaultdict(set)
+        self.hook_letters_version = 0  # bumped whenever `hook_letters` changes, for the board's key
         self.display_hook_letters = Hooks.OFF
 
         self.DEFINITIONS = dict()
@@ -356,7 +202,32 @@ class MyGame(arcade.Window):
                 word = line.strip()
                 self.KNOW.add(word)
 
-        self.trie = nwl_2020()
+        self.trie   = nwl_2020()
+        self.gaddag = nwl_2020(gaddag=True)
+
+        # anchors and cross-checks of the committed board, patched after every play
+        self.analysis   = BoardAnalysis(self.gaddag, self.grid)
+        self.play_cache = PlayCache()
+
+        # move generation runs on worker processes so the window keeps drawing while they search; each
+        # search starts as soon as its board is final, so it is usually done by the time its turn comes
+        self.background            = ParallelSolver(self.gaddag.path)
+        self.player_search         = None  # `SolveJob` for the player's plays, keyed on `position_key`
+        self.player_key            = None  # position `player_plays` are complete for
+        self.player_search_start   = 0.0
+        # with a leave table the computer picks plays by score plus the value of the tiles it keeps, and the
+        # player's plays are ranked the same way: the top words then read "WORD (score+leave)"
+        self.leaves_path           = NWL_2020_LEAVES if os.path.exists(NWL_2020_LEAVES) else None
+        self.leave_table           = leaves.shared(self.leaves_path) if self.leaves_path else None
+        if self.leaves_path is None:
+            log(f"no leave table at {NWL_2020_LEAVES} (see learn_leaves.py), plays are ranked by score", LogType.INFO)
+        else:
+            log("plays are ranked by score plus leave value", LogType.INFO)
+        self.computer_search       = None  # future of the computer's play
+        self.computer_search_key   = None  # position it is searching
+        self.computer_search_start = 0.0
+        self.endgame_result        = None  # (value, depth, exact) of the computer's last endgame search, shown left of the rack
+        self.validated       = (None, Err("no letters typed"))  # last `is_playable_and_score_and_word` and its key
 
         self.letters_typed        = {}
         self.letters_to_highlight = set()
@@ -366,11 +237,20 @@ class MyGame(arcade.Window):
         self.just_bingoed         = False
         self.definition           = ""
 
-    def draw_letter(self, letter, x, y, color, pos):
-        arcade.draw_rectangle_filled(x, y, WIDTH, HEIGHT, color)
+        # position the player's plays were generated for (board, blanks, rack, unseen tiles), for simulation
+        self.analysis_position = None
+        self.simulator         = None  # runs on the workers of `background`
+        self.simulation        = None  # `SimulationJob` started with TAB, polled every frame until it is done
+
+        # drawing: each part of the window keeps its shapes and texts until what it shows changes
+        self.regions = {name: Region(FONT) for name in ("board", "cursor", "scores", "top_words", "tiles_left", "rack", "definition", "endgame")}
+        self.emojis  = Emojis("../emojis")
+
+    def draw_letter(self, region, letter, x, y, color, pos):
+        region.rect(x, y, WIDTH, HEIGHT, color)
         if not self.just_bingoed and pos in self.letters_bingoed:
-            arcade.draw_rectangle_outline(x, y, WIDTH-4, HEIGHT-4, arcade.color.DARK_PASTEL_GREEN, 5)
-        arcade.draw_text(letter, x-HORIZ_TEXT_OFFSET, y-VERT_TEXT_OFFSET, arcade.color.WHITE, FONT_SIZE, bold=True, font_name=FONT)
+            region.outline(x, y, WIDTH-4, HEIGHT-4, arcade.color.DARK_PASTEL_GREEN, 5)
+        region.text(letter, x-HORIZ_TEXT_OFFSET, y-VERT_TEXT_OFFSET, arcade.color.WHITE, FONT_SIZE)
         # if letter.isupper():
 
     def on_draw(self):
@@ -384,7 +264,91 @@ class MyGame(arcade.Window):
             played_tile_color = arcade.color.SAE
             self.player_current_play = Err("not ok")
 
-        # Draw the grid
+        # each region is described again only when the state in its key changed
+        typed = tuple(self.letters_typed.items())
+        self.regions["board"].draw((self.grid.hash, typed, played_tile_color, frozenset(self.letters_to_highlight),
+                                    frozenset(self.temp_blank_letters | self.blank_letters), frozenset(self.letters_bingoed),
+                                    self.just_bingoed, self.display_hook_letters, self.hook_letters_version),
+                                   lambda board: self.describe_board(board, played_tile_color))
+        self.regions["cursor"].draw((self.cursor.dir, self.cursor.x, self.cursor.y, bool(typed)), self.describe_cursor)
+        current = self.player_current_play.unwrap().score if self.player_current_play.is_ok() else None
+        self.regions["scores"].draw((self.player.score, self.player.last_word_score, self.computer.score,
+                                     self.computer.last_word_score, current), self.describe_scores)
+        self.regions["top_words"].draw((self.player_plays_version, self.phase, self.pause_for_analysis_rank,
+                                        frozenset(self.player_words_found), frozenset(self.player_scores_found)), self.describe_top_words)
+        tiles_left = tuple(sorted(self.tile_bag[self.tile_bag_index:] + self.computer.tiles))
+        self.regions["tiles_left"].draw(tiles_left, lambda unseen: self.describe_tiles_left(unseen, tiles_left))
+        self.regions["rack"].draw((tuple(self.player.tiles), typed, len(self.temp_blank_letters), self.phase, played_tile_color),
+                                  lambda rack: self.describe_rack(rack, played_tile_color))
+
+        # Draw word definition
+        x = 12 * (MARGIN + WIDTH) + MARGIN + WIDTH // 2
+        y = 50
+        emoji = self.emojis.for_definition(self.definition)
+        if emoji:
+            arcade.draw_texture_rectangle(x - 40, y + 18, 40, 40, emoji, 0)
+        self.regions["definition"].draw(self.definition, lambda definition: self.describe_definition(definition, x, y))
+        self.regions["endgame"].draw(self.endgame_result, self.describe_endgame)
+
+        ## extra points
+        if self.phase not in [Phase.FINAL_SCORE, Phase.EXIT] and (len(self.player.tiles) == 0 or len(self.computer.tiles) == 0):
+            self.phase = Phase.FINAL_SCORE
+            print(self.phase)
+            if len(self.computer.tiles):
+                extra_points = 2 * sum(TILE_SCORE.get(c) for c in self.computer.tiles)
+                self.player.score += extra_points
+            else:
+                extra_points = 2 * sum(TILE_SCORE.get(c) for c in self.player.tiles)
+                self.computer.score += extra_points
+            print(f"{extra_points=}")
+            print("GAME OVER")
+            print("Press ENTER to exit.")
+
+        if self.phase == Phase.EXIT:
+            sys.exit()
+            return
+
+        # COMPUTER LOGIC
+        if self.phase == Phase.COMPUTERS_TURN and (play := self.computer_play()) is not None:
+            self.blank_letters = self.blank_letters | play.blanks
+
+            self.computer.tiles = self.play_word(play, self.computer.tiles)
+            self.analysis.tiles_placed(self.grid, [(14 - row, col) for row, col in self.letters_to_highlight], play.blanks)
+            self.grid.commit()
+
+            # this was copied
+            tiles_needed = 7 - len(self.computer.tiles)
+            if play.is_bingo:
+                self.letters_bingoed = self.letters_bingoed.union(self.letters_to_highlight)
+            self.computer.tiles += self.tile_bag[self.tile_bag_index:self.tile_bag_index + tiles_needed]
+            self.tile_bag_index += tiles_needed
+
+            self.computer.last_word_score = play.score
+            self.computer.score          += play.score
+            self.phase                    = Phase.PLAYERS_TURN
+
+            self.last_grid = self.grid.copy()
+
+            # the board is final, so the player's plays can be searched while the question below is open
+            self.update_player_plays()
+
+            # add computers played word to dictionary if you know it
+            if play.word not in self.KNOW:
+                Tk().wm_withdraw() # to hide the main window
+                response = messagebox.askyesno("", f"Do you know: {play.word}?")
+                if response == 1:
+                    self.KNOW.add(play.word)
+
+        # SIMULATION
+        if self.simulation is not None:
+            self.update_simulation()
+
+        # PLAYER WORD SOLVER
+        if self.player_search is not None or (self.phase == Phase.PLAYERS_TURN and self.player_key != self.position_key(self.player.tiles)):
+            self.update_player_plays()
+
+    def describe_board(self, board, played_tile_color):
+        """Squares, tiles, typed letters and hook letters of the board."""
         for row in range(ROW_COUNT):
             board_row = 14 - row
             for column in range(COLUMN_COUNT):
@@ -406,26 +370,28 @@ class MyGame(arcade.Window):
                 blank = pos in self.temp_blank_letters | self.blank_letters
                 if blank:
                     letter = letter.lower()
-                self.draw_letter(letter, x, y, color, pos)
+                self.draw_letter(board, letter, x, y, color, pos)
 
                 if pos not in self.letters_typed and self.display_hook_letters != Hooks.OFF and pos in self.hook_letters:
                     text_color = arcade.color.WHITE if color in [COLOR_TRIPLE_LETTER, COLOR_TRIPLE_WORD] else arcade.color.BLACK
                     letters = self.hook_letters[pos]
                     xd, yd = 0, 0
                     for letter in letters:
-                        arcade.draw_text(letter, x - WIDTH / 2.35 + xd, y + HEIGHT / 3.4 - yd, text_color, 10, bold=True, font_name=FONT)
+                        board.text(letter, x - WIDTH / 2.35 + xd, y + HEIGHT / 3.4 - yd, text_color, 10)
                         xd += 12
                         if xd == 48:
                             xd  = 0
                             yd += 11
 
-        # Draw cursor
+    def describe_cursor(self, cursor):
         if self.cursor.dir is not None and len(self.letters_typed) == 0:
             arrow = "→" if self.cursor.dir == Direction.ACROSS else "↓"
             x = (MARGIN + WIDTH)  * self.cursor.x + MARGIN + WIDTH  // 2
             y = (MARGIN + HEIGHT) * self.cursor.y + MARGIN + HEIGHT // 2 + BOTTOM_MARGIN
-            self.draw_letter(arrow, x, y, arcade.color.BLACK, None)
+            self.draw_letter(cursor, arrow, x, y, arcade.color.BLACK, None)
 
+    def describe_scores(self, scores):
+        """The player's and the computer's score boxes, the player's counting the play typed so far."""
         # Draw player score boxes
         column = 15
         row    = 14
@@ -440,8 +406,8 @@ class MyGame(arcade.Window):
             score = f"{self.player.score} ({self.player.last_word_score})"
         diff   = (self.player.score + additional_points) - self.computer.score
         color  = [arcade.color.HOT_PINK, arcade.color.YELLOW, arcade.color.DARK_PASTEL_GREEN][1 + sign(diff)]
-        arcade.draw_rectangle_filled(x, y, SCORE_BOX_WIDTH, HEIGHT, color)
-        arcade.draw_text(score, x-HORIZ_TEXT_OFFSET*4, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20, bold=True, font_name=FONT)
+        scores.rect(x, y, SCORE_BOX_WIDTH, HEIGHT, color)
+        scores.text(score, x-HORIZ_TEXT_OFFSET*4, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20)
 
         # Draw computer score box
         column = 15
@@ -450,11 +416,11 @@ class MyGame(arcade.Window):
         color  = [arcade.color.HOT_PINK, arcade.color.YELLOW, arcade.color.DARK_PASTEL_GREEN][1 + sign(diff)]
         x = (MARGIN + WIDTH)  * column + (MARGIN + SCORE_BOX_WIDTH) + MARGIN * 2 + SCORE_BOX_WIDTH // 2
         y = (MARGIN + HEIGHT) * row    + MARGIN + HEIGHT // 2 + BOTTOM_MARGIN
-        arcade.draw_rectangle_filled(x, y, SCORE_BOX_WIDTH, HEIGHT, color)
+        scores.rect(x, y, SCORE_BOX_WIDTH, HEIGHT, color)
         score = f"{self.computer.score} ({self.computer.last_word_score})"
-        arcade.draw_text(score, x-HORIZ_TEXT_OFFSET*4, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20, bold=True, font_name=FONT)
+        scores.text(score, x-HORIZ_TEXT_OFFSET*4, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20)
 
-        # Draw top word boxes
+    def describe_top_words(self, top_words):
         play_index = 1
         for row in reversed(range(ROW_COUNT - 1)):
             render_row = 14 - row # and place
@@ -477,15 +443,15 @@ class MyGame(arcade.Window):
                 color = arcade.color.LIGHT_GRAY
             x = (MARGIN + WIDTH)  * column + (2 * MARGIN) + TOP_WORD_BOX_WIDTH // 2
             y = (MARGIN + HEIGHT) * row    + MARGIN + HEIGHT // 2 + BOTTOM_MARGIN
-            arcade.draw_rectangle_filled(x, y, TOP_WORD_BOX_WIDTH, HEIGHT, color)
+            top_words.rect(x, y, TOP_WORD_BOX_WIDTH, HEIGHT, color)
             if play_index in self.player_words_found or self.phase in [Phase.PAUSE_FOR_ANALYSIS, Phase.FINAL_SCORE]:
-                arcade.draw_rectangle_filled(x, y, TOP_WORD_BOX_WIDTH, HEIGHT, color)
-                display = f"{render_row}: {play.word} ({play.score})"
-                arcade.draw_text(display, x-HORIZ_TEXT_OFFSET-130, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20, bold=True, font_name=FONT)
+                leave   = f"{self.leave_table.value(play.leave):+.0f}" if self.leave_table else ""
+                display = f"{render_row}: {play.word} ({play.score}{leave})"
+                top_words.text(display, x-HORIZ_TEXT_OFFSET-130, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20)
             play_index += 1
 
-        # Draw remaining tiles
-        tiles_left = sorted(self.tile_bag[self.tile_bag_index:] + self.computer.tiles)
+    def describe_tiles_left(self, unseen, tiles_left):
+        """The tiles still in the bag or on the computer's rack."""
         row, column = 14, 15
         for i, tile in enumerate(tiles_left):
             if i != 0 and i % 7 == 0:
@@ -496,11 +462,11 @@ class MyGame(arcade.Window):
             if tile == " ":     color = arcade.color.AMETHYST
             x = (MARGIN + WIDTH)  * column + (2 * MARGIN) + TOP_WORD_BOX_WIDTH + (6 * MARGIN)
             y = (MARGIN + HEIGHT) * row    + MARGIN + HEIGHT // 2 + BOTTOM_MARGIN
-            arcade.draw_rectangle_filled(x, y, WIDTH, HEIGHT, color)
-            arcade.draw_text(tile, x-HORIZ_TEXT_OFFSET+5, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20, bold=True, font_name=FONT)
+            unseen.rect(x, y, WIDTH, HEIGHT, color)
+            unseen.text(tile, x-HORIZ_TEXT_OFFSET+5, y-VERT_TEXT_OFFSET*.75, arcade.color.BLACK, 20)
             column += 1
 
-        # Draw tile rack
+    def describe_rack(self, rack, played_tile_color):
         tiles_left = list(self.letters_typed.values())
         blanks_typed = len(self.temp_blank_letters)
         for i, tile in enumerate(self.player.tiles):
@@ -515,94 +481,22 @@ class MyGame(arcade.Window):
             x = (4 + i) * (MARGIN + WIDTH) + MARGIN + WIDTH // 2
             y = 50
 
-            self.draw_letter(tile, x, y, color, None)
-
-        # Draw word definition
-        x = 12 * (MARGIN + WIDTH) + MARGIN + WIDTH // 2
-        y = 50
-        emoji = None
-        if   "fish"     in self.definition.lower(): emoji = arcade.load_texture("../emojis/fish.png")
-        elif "tree"     in self.definition.lower(): emoji = arcade.load_texture("../emojis/tree.png")
-        elif "insect"   in self.definition.lower(): emoji = arcade.load_texture("../emojis/bug.png")
-        elif "flower"   in self.definition.lower(): emoji = arcade.load_texture("../emojis/flower.png")
-        elif "plant"    in self.definition.lower(): emoji = arcade.load_texture("../emojis/plant.png")
-        elif "monetary" in self.definition.lower(): emoji = arcade.load_texture("../emojis/dollar.png")
-        elif "bird"     in self.definition.lower(): emoji = arcade.load_texture("../emojis/bird.png")
-        elif "letter"   in self.definition.lower(): emoji = arcade.load_texture("../emojis/letters.png")
-        elif "water"    in self.definition.lower(): emoji = arcade.load_texture("../emojis/water.png")
-        elif "gem"      in self.definition.lower(): emoji = arcade.load_texture("../emojis/gem.png")
-        elif "wine"     in self.definition.lower(): emoji = arcade.load_texture("../emojis/wine.png")
-        elif "element"  in self.definition.lower(): emoji = arcade.load_texture("../emojis/ptoe.png")
-        elif "chemical" in self.definition.lower(): emoji = arcade.load_texture("../emojis/chemical.png")
-        elif "science"  in self.definition.lower(): emoji = arcade.load_texture("../emojis/chemical.png")
-        elif "greek"    in self.definition.lower(): emoji = arcade.load_texture("../emojis/greek.png")
-        elif "jewish"   in self.definition.lower(): emoji = arcade.load_texture("../emojis/israel.png")
-        elif "hebrew"   in self.definition.lower(): emoji = arcade.load_texture("../emojis/israel.png")
-        elif "mulsim"   in self.definition.lower(): emoji = arcade.load_texture("../emojis/muslim.png")
+            self.draw_letter(rack, tile, x, y, color, None)
 
+    def describe_definition(self, definition, x, y):
         lines = word_wrap_split(self.definition, 80)
-        if emoji:
-            arcade.draw_texture_rectangle(x - 40, y + 18, 40, 40, emoji, 0)
         for i, line in enumerate(lines):
-            arcade.draw_text(line, x-HORIZ_TEXT_OFFSET, y-VERT_TEXT_OFFSET + (25 * (1 - i)), arcade.color.WHITE, 15, font_name=FONT, bold=True)
+            definition.text(line, x-HORIZ_TEXT_OFFSET, y-VERT_TEXT_OFFSET + (25 * (1 - i)), arcade.color.WHITE, 15)
 
-        ## extra points
-        if self.phase not in [Phase.FINAL_SCORE, Phase.EXIT] and (len(self.player.tiles) == 0 or len(self.computer.tiles) == 0):
-            self.phase = Phase.FINAL_SCORE
-            print(self.phase)
-            if len(self.computer.tiles):
-                extra_points = 2 * sum(TILE_SCORE.get(c) for c in self.computer.tiles)
-                self.player.score += extra_points
-            else:
-                extra_points = 2 * sum(TILE_SCORE.get(c) for c in self.player.tiles)
-                self.computer.score += extra_points
-            print(f"{extra_points=}")
-            print("GAME OVER")
-            print("Press ENTER to exit.")
-
-        if self.phase == Phase.EXIT:
-            sys.exit()
+    def describe_endgame(self, endgame):
+        """How far the computer's last endgame search got: the spread it expects and whether that is exact,
+        or how many plies it looked ahead before `ENDGAME_TIME_BUDGET` ran out."""
+        if self.endgame_result is None:
             return
-
-        # COMPUTER LOGIC
-        if self.phase == Phase.COMPUTERS_TURN:
-            sorted_words = self.generate_all_plays(self.computer.tiles)
-
-            i = -1
-            while sorted_words[i].word in self.KNOW:
-                log(f"skip {sorted_words[i].word} ({abs(i)})", LogType.INFO)
-                i -= 1
-            play = sorted_words[i]
-
-            # add computers played word to dictionary if you know it
-            if play.word not in self.KNOW:
-                Tk().wm_withdraw() # to hide the main window
-                response = messagebox.askyesno("", f"Do you know: {play.word}?")
-                if response == 1:
-                    self.KNOW.add(play.word)
-
-            self.blank_letters = self.blank_letters | play.blanks
-
-            self.computer.tiles = self.play_word(play, self.computer.tiles)
-
-            # this was copied
-            tiles_needed = 7 - len(self.computer.tiles)
-            if play.is_bingo:
-                self.letters_bingoed = self.letters_bingoed.union(self.letters_to_highlight)
-            self.computer.tiles += self.tile_bag[self.tile_bag_index:self.tile_bag_index + tiles_needed]
-            self.tile_bag_index += tiles_needed
-
-            self.computer.last_word_score = play.score
-            self.computer.score          += play.score
-            self.phase                    = Phase.PLAYERS_TURN
-
-            self.last_grid = self.grid.copy()
-
-        # PLAYER WORD SOLVER
-        if (self.phase == Phase.PLAYERS_TURN and not self.player_plays):
-            self.player_plays          = self.generate_all_plays(self.player.tiles)
-            self.filtered_player_plays = [word for word in self.player_plays if len(word.blanks) == 0 or word.score >= 50][-14:]
-            log("done generating plays", LogType.OK)
+        value, depth, exact = self.endgame_result
+        x = MARGIN + WIDTH // 2
+        endgame.text(f"endgame: {value:+.0f}", x-HORIZ_TEXT_OFFSET, 60, arcade.color.WHITE, 15)
+        endgame.text("exact" if exact else f"{depth} plies, cut off", x-HORIZ_TEXT_OFFSET, 35, arcade.color.WHITE, 15)
 
     def recursive_definition(self, word, num):
         definition = self.DEFINITIONS[word.upper()]
@@ -657,11 +551,21 @@ class MyGame(arcade.Window):
         self.phase                   = Phase.COMPUTERS_TURN
         self.pause_for_analysis_rank = None
         self.player_plays            = []
+        self.player_plays_version   += 1
+        self.player_key              = None
+        if self.player_search is not None:
+            self.player_search.cancel()
+            self.player_search = None
+        if self.simulation is not None:  # the analysis is over, the workers are needed for the next searches
+            self.simulation.cancel()
+            self.simulation = None
         self.just_bingoed            = False
         self.display_hook_letters    = Hooks.OFF
         self.hook_letters.clear()
+        self.hook_letters_version   += 1
         self.player_scores_found.clear()
         self.player_words_found.clear()
+        self.player_plays_typed.clear()
         self.letters_to_highlight.clear()
         self.cursor.x = min(14, self.cursor.x)
         self.cursor.y = max(0, self.cursor.y)
@@ -685,7 +589,8 @@ class MyGame(arcade.Window):
 
                     self.grid = self.last_grid.copy()
                     self.letters_to_highlight.clear()
-                    self.play_word(self.filtered_player_plays[-self.pause_for_analysis_rank], None)
+                    if self.filtered_player_plays:  # empty until the first plays come in
+                        self.play_word(self.filtered_player_plays[-self.pause_for_analysis_rank], None)
 
                 else:
                     if self.cursor.dir is None:
@@ -742,10 +647,11 @@ class MyGame(arcade.Window):
                 self.player_current_play = potential_play
                 if potential_play.is_ok():
                     play = potential_play.unwrap()
+                    if play not in self.player_plays_typed:
+                        self.player_plays_typed.append(play)
+                    self.rank_typed_plays()
+                    self.player_scores_found.add(play.score)
                     try:
-                        rank = self.player_plays[::-1].index(play) + 1
-                        self.player_words_found.add(rank)
-                        self.player_scores_found.add(play.score)
                         self.definition = self.recursive_definition(play.word, 1)
                     except Exception:
                         log(f"failed to play: {play}", LogType.FAIL)
@@ -772,15 +678,18 @@ class MyGame(arcade.Window):
         if key == arcade.key.SPACE:
             random.shuffle(self.player.tiles)
 
+        if key == arcade.key.TAB and self.phase == Phase.PAUSE_FOR_ANALYSIS:
+            self.simulate_top_plays()
+
         if key == arcade.key.SLASH:
             if self.display_hook_letters in [Hooks.OFF, Hooks.ALL] :
                 self.display_hook_letters = Hooks.ALL if self.display_hook_letters == Hooks.OFF else Hooks.ON_RACK
                 self.hook_letters.clear()
-                solver = SolverState(self.trie, self.grid, self.player.tiles)
-                hooks = solver.cross_check_for_display(self.display_hook_letters == Hooks.ON_RACK)
-                for pos in self.grid.all_positions():
-                    row, col = pos
-                    self.hook_letters[(14 - row, col)] = hooks[pos]
+                # read off the committed board's cross-checks, which are kept up to date after every play
+                hooks = self.analysis.hook_letters(self.player.tiles if self.display_hook_letters == Hooks.ON_RACK else None)
+                for (row, col), letters in hooks.items():
+                    self.hook_letters[(14 - row, col)] = letters
+                self.hook_letters_version += 1
             else:
                 self.display_hook_letters = Hooks.OFF
 
@@ -811,7 +720,11 @@ class MyGame(arcade.Window):
             if self.phase == Phase.PAUSE_FOR_ANALYSIS:
                 self.setup_for_computers_turn(Exchange.NO)
 
-            if self.phase == Phase.PLAYERS_TURN:
+            if self.phase == Phase.PLAYERS_TURN and self.player_key != self.position_key(self.player.tiles):
+                # the play's rank is only known once every share of the search is in
+                log("still generating plays, press ENTER again in a moment", LogType.INFO)
+
+            elif self.phase == Phase.PLAYERS_TURN:
                 potential_play = self.is_playable_and_score_and_word()
                 if potential_play.is_ok():
                     log("word is ok", LogType.OK)
@@ -824,7 +737,7 @@ class MyGame(arcade.Window):
                         self.player.word_ranks.append(min(self.player_words_found))
                         print(("{:.1f}".format(sum(self.player.word_ranks) / len(self.player.word_ranks))), self.player.word_ranks)
                     else:
-                        breakpoint()
+                        log(f"{play.word} is not among the generated plays, its rank is not recorded", LogType.FAIL)
 
                     for (row, col), letter in self.letters_typed.items():
                         if (row, col) in self.temp_blank_letters:
@@ -832,6 +745,8 @@ class MyGame(arcade.Window):
                         else:
                             self.player.tiles.remove(letter)
                         self.grid.set_tile((14-row, col), letter)
+                    self.analysis.tiles_placed(self.grid, [(14-row, col) for row, col in self.letters_typed], self.temp_blank_letters)
+                    self.grid.commit()
                     # we copy pasted the next three lines
                     tiles_needed                = 7 - len(self.player.tiles)
                     self.player.tiles          += self.tile_bag[self.tile_bag_index:self.tile_bag_index + tiles_needed]
@@ -839,34 +754,139 @@ class MyGame(arcade.Window):
                     self.phase                  = Phase.PAUSE_FOR_ANALYSIS
                     self.grid_backup            = self.grid.copy()
                     self.cursor.dir             = None
+                    # the computer's reply is searched while the player looks over the plays they could have made
+                    self.start_computer_search(self.grid_backup, self.blank_letters | self.temp_blank_letters)
                     if play.is_bingo:
                         self.letters_bingoed = self.letters_bingoed.union(self.letters_typed.keys())
                         self.just_bingoed    = True
                     self.letters_typed.clear()
                     self.hook_letters.clear()
+                    self.hook_letters_version += 1
 
     def is_playable(self):
         return self.is_playable_and_score_and_word().is_ok()
 
     def is_playable_and_score_and_word(self):
         if len(self.letters_typed):
-            start_row, start_col = next(iter(self.letters_typed))
-            dir     = self.cursor.dir
-            pos     = Position(dir, start_row, start_col) # start row is super hacky
-            letters = "".join(self.letters_typed.values())
-            return word_score(self.grid, self.trie, letters, pos, True, self.temp_blank_letters | self.blank_letters)
+            # checked once per change rather than every frame
+            key = (tuple(self.letters_typed.items()), frozenset(self.temp_blank_letters | self.blank_letters), self.grid.hash, self.cursor.dir)
+            if self.validated[0] != key:
+                start_row, start_col = next(iter(self.letters_typed))
+                dir     = self.cursor.dir
+                pos     = Position(dir, start_row, start_col) # start row is super hacky
+                letters = "".join(self.letters_typed.values())
+                self.validated = (key, word_score(self.grid, self.trie, letters, pos, True, self.temp_blank_letters | self.blank_letters))
+            return self.validated[1]
         return Err("no letters typed")
 
-    def generate_all_plays(self, tiles):
-        plays = SolverState(self.trie, self.grid, tiles).find_all_options()
-        valid_plays = []
-        for pos, letters, blanks in plays:
-            score = word_score(self.grid, self.trie, letters, Position(pos.dir, 14-pos.row, pos.col), True, blanks | self.blank_letters)
-            if score.is_ok():
-                valid_plays.append(score.unwrap())
-        return sorted(valid_plays)
+    def simulate_top_plays(self):
+        """Starts simulating the top plays of the last position on the background workers; `update_simulation`
+        logs the ranking. A simulation still running is dropped."""
+        if self.simulator is None:
+            self.simulator = Simulator(self.gaddag.path, self.background.workers, self.leaves_path, self.background.executor)
+        if self.simulation is not None:
+            self.simulation.cancel()
+        candidates      = self.filtered_player_plays[-SIMULATION_CANDIDATES:][::-1]
+        self.simulation = self.simulator.start(self.analysis_position, candidates)
+
+    def update_simulation(self):
+        """Takes in the simulation batches finished since the last frame, and logs the ranking once it is done."""
+        self.simulation.poll()
+        if not self.simulation.done():
+            return
+        for rank, candidate in enumerate(self.simulation.candidates(), 1):
+            play = candidate.play
+            log(f"{rank}: {play.word} ({play.score}) equity {candidate.mean:.1f} ± {1.96 * candidate.stderr:.1f} over {len(candidate.equities)} games", LogType.INFO)
+        self.simulation = None
+
+    def position_key(self, tiles):
+        return PlayCache.key(self.grid, tiles, self.blank_letters)
+
+    def update_player_plays(self):
+        """Starts the search for the player's plays, or takes in what it found since the last frame.
+
+        The plays fill in share by share; a search for a position the player has left is dropped."""
+        key = self.position_key(self.player.tiles)
+        if self.player_search is not None and self.phase == Phase.PLAYERS_TURN and self.player_search.key != key:
+            self.player_search.cancel()
+            self.player_search = None
+        if self.player_search is None:
+            self.analysis_position = (self.grid.copy(), set(self.blank_letters), self.player.tiles[:],
+                                      sorted(self.tile_bag[self.tile_bag_index:] + self.computer.tiles))
+            plays = self.play_cache.get(key)
+            if plays is None:
+                self.player_search       = self.background.submit(self.grid, self.player.tiles, self.blank_letters, self.analysis, key=key)
+                self.player_search_start = time.perf_counter()
+                self.show_player_plays([])
+                return
+        else:
+            if self.player_search.poll():
+                self.show_player_plays(self.player_search.plays())
+            if not self.player_search.done():
+                return
+            key, plays = self.player_search.key, self.player_search.plays()
+            self.play_cache.put(key, plays)
+            instrument.record("player", 1000 * (time.perf_counter() - self.player_search_start), self.player_search.records,
+                              rack="".join(sorted(key[2])), board=key[0])
+            self.player_search = None
+        self.show_player_plays(plays)
+        self.player_key = key
+        log("done generating plays", LogType.OK)
+        if recorder := instrument.recorder():
+            for kind, histogram in recorder.histograms.items():
+                log(f"{kind} move generation: {histogram.summary()}", LogType.INFO)
+
+    def show_player_plays(self, plays):
+        self.player_plays          = self.leave_table.rank(plays) if self.leave_table else sorted(plays)
+        self.player_plays_version += 1
+        self.filtered_player_plays = [word for word in self.player_plays if len(word.blanks) == 0 or word.score >= 50][-14:]
+        self.rank_typed_plays()
+
+    def rank_typed_plays(self):
+        """Ranks of the plays typed this turn among the plays found so far; later shares can push them down."""
+        plays = self.player_plays[::-1]
+        self.player_words_found = {plays.index(play) + 1 for play in self.player_plays_typed if play in plays}
+
+    def start_computer_search(self, board, board_blanks):
+        """Starts the search for the computer's play on `board`, unless one for the same position is under way.
+
+        A search for another position is dropped: cancelled if it has not started, left to finish unread if it has."""
+        key = (board.hash, frozenset(board_blanks), "".join(sorted(self.computer.tiles)), "".join(sorted(self.player.tiles)), self.tile_bag_index)
+        if self.computer_search is not None and self.computer_search_key == key:
+            return
+        if self.computer_search is not None:
+            self.computer_search.cancel()
+        endgame = ENDGAME_TIME_BUDGET if self.tile_bag_index >= len(self.tile_bag) else None
+        self.computer_search       = self.background.submit_best_play(board, board_blanks, [self.computer.tiles, self.player.tiles],
+                                                                      self.KNOW, endgame, self.leaves_path)
+        self.computer_search_key   = key
+        self.computer_search_start = time.perf_counter()
+
+    def computer_play(self):
+        """The best play whose word you don't know yet, by score plus leave value when there is a leave table;
+        once the bag is empty the best finish. None while the search is still running on a worker."""
+        self.start_computer_search(self.grid, self.blank_letters)
+        if not self.computer_search.done():
+            return None
+        play, solution, record = self.computer_search.result()
+        self.computer_search = None
+        instrument.record("computer", 1000 * (time.perf_counter() - self.computer_search_start), (record,),
+                          rack="".join(self.computer.tiles), board=self.grid.hash)
+        if solution is not None:
+            self.endgame_result = (solution.value, solution.depth, solution.exact)
+            log(f"endgame: {solution.value:+} over {solution.depth} plies ({'exact' if solution.exact else 'out of time'})", LogType.INFO)
+        if play is None:  # the window has no way to pass, so the turn goes back to the player
+            log("computer has no play", LogType.FAIL)
+            self.phase = Phase.PLAYERS_TURN
+        return play
+
 
 def main():
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--profile", metavar="PATH", help="append a JSON line per turn with solver counters and phase times to PATH")
+    args = parser.parse_args()
+    if args.profile:
+        instrument.enable(args.profile)
     MyGame(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
     arcade.run()
 
@@ -0,0 +1,201 @@
+# Parallel move generation: the anchors of a position are split across worker processes.
+#
+# Every worker maps the same lexicon file once, in its initializer, so all of them walk one
+# page-cached copy. A solve pickles the board, the rack and the cross-check tables once, to a
+# file of its own; its shares carry only that file's path and their (direction, anchor) pairs,
+# so each worker reads the position once per solve, however many shares it runs. Solves can
+# also be left running in the background (`submit`), which is how the game window keeps
+# drawing meanwhile.
+# While instrumentation is on, each worker records its part of a search and sends the record
+# back with its plays.
+
+import os
+import pickle
+import tempfile
+from collections.abc import Collection, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from contextlib import suppress
+from functools import lru_cache
+from typing import Any, cast
+
+import instrument
+import leaves
+import lexicon
+from analysis import BoardAnalysis
+from board import Board, CellCoord, Direction, Letter
+from endgame import EndgameSolver, Solution
+from instrument import TurnRecord
+from scoring import Play
+from solver import GaddagSolverState
+
+SHARES_PER_WORKER = 4  # shares per worker in a background solve, so its plays come in a bit at a time
+POSITIONS_KEPT    = 2  # positions a worker keeps unpickled, for solves whose shares interleave
+
+Tables   = dict[Direction, tuple[dict[CellCoord, int], dict[CellCoord, int]]]  # cross-check masks and cross-scores
+Snapshot = tuple[Board, list[Letter], set[CellCoord] | None, set[CellCoord], Tables]  # board, rack, board blanks, anchors, tables
+Share    = tuple[list[list[Play]], TurnRecord | None]  # plays of each pair of a share, and the worker's record of it
+BestPlay = tuple[Play | None, Solution | None, TurnRecord | None]  # see `_best_play`
+
+
+@lru_cache(maxsize=POSITIONS_KEPT)
+def _position(path: str) -> Snapshot:
+    """Board, rack, board blanks, anchors and tables of a solve, read from the file `ParallelSolver.submit` wrote."""
+    with open(path, "rb") as file:
+        return cast(Snapshot, pickle.load(file))
+
+
+def _solve_share(path: str, share: list[tuple[Direction, CellCoord]], instrumented: bool = False) -> Share:
+    """Runs the generator from each (direction, anchor) pair of `share` on the position in the file at `path`;
+    one list of plays per pair (raw tuples when the position has no board blanks), and the worker's record
+    of the share when `instrumented`."""
+    with instrument.worker_turn("share", instrumented) as record:
+        board, rack, board_blanks, anchors, tables = _position(path)
+        solver = GaddagSolverState(lexicon.attached(), board, rack)
+        solver.board_blanks = board_blanks
+        solver.anchors      = anchors
+        found: list[list[Play]] = []
+        for direction, anchor_pos in share:
+            solver.direction = direction
+            solver.cross_masks, solver.cross_scores = tables[direction]
+            solver.plays = []
+            solver.generate_at(anchor_pos)
+            found.append(solver.plays)
+    return found, record
+
+
+def _best_play(board: Board, board_blanks: set[CellCoord], racks: Sequence[Sequence[Letter]], exclude: Collection[str],
+               endgame_budget: float | None, leaves_path: str | None = None,
+               instrumented: bool = False) -> BestPlay:
+    """The best play for `racks[0]` whose word is not in `exclude`: by score plus leave value when given the
+    leave table at `leaves_path`, or with an `endgame_budget` the endgame solver's move, unless that is a
+    pass. Returns the play, the endgame solution, if any, and the worker's record of the search when
+    `instrumented`."""
+    with instrument.worker_turn("best play", instrumented) as record:
+        play, solution = None, None
+        if endgame_budget is not None:
+            solution = EndgameSolver(lexicon.attached(), board, board_blanks, racks, exclude=exclude).solve(endgame_budget)
+            if solution.moves and solution.moves[0] is not None:
+                play = solution.moves[0]
+        solver = GaddagSolverState(lexicon.attached(), board, list(racks[0]))
+        if play is None and leaves_path is not None:
+            ranked = leaves.shared(leaves_path).rank(found for found in solver.find_all_plays(board_blanks) if found.word not in exclude)
+            play   = ranked[-1] if ranked else None
+        elif play is None:
+            plays = solver.find_top_k(1, board_blanks, exclude)
+            play  = plays[0] if plays else None
+    return play, solution, record
+
+
+class SolveJob:
+    """A solve running on a `ParallelSolver`; its plays come in share by share."""
+
+    def __init__(self, futures: list[Future[Share]], pairs: int, key=None) -> None:
+        self.futures = futures
+        self.key     = key  # whatever the caller needs to tell which position this is for
+        self.records: list[TurnRecord] = []  # the workers' records of the shares collected, while instrumented
+        self._pairs  = pairs
+        self._found: list[list[list[Play]] | None] = [None] * len(futures)
+
+    def poll(self) -> bool:
+        """Collects the shares finished since the last call; True if there were any."""
+        new = False
+        for i, future in enumerate(self.futures):
+            if self._found[i] is None and future.done() and not future.cancelled():
+                self._found[i], record = future.result()
+                if record is not None:
+                    self.records.append(record)
+                new = True
+        return new
+
+    def done(self) -> bool:
+        return all(future.done() for future in self.futures)
+
+    def plays(self) -> list[Play]:
+        """The plays found so far; once `done`, the same plays in the same order as the serial generator."""
+        self.poll()
+        shares = len(self.futures)
+        found: list[list[Play]] = [[] for _ in range(self._pairs)]
+        for i, share in enumerate(self._found):
+            if share is not None:  # each pair's plays go back in their serial slot
+                found[i::shares] = share
+        return [play for plays in found for play in plays]
+
+    def result(self) -> list[Play]:
+        wait(self.futures)
+        return self.plays()
+
+    def cancel(self) -> None:
+        """Drops the shares no worker has started yet; results of the running ones are ignored."""
+        for future in self.futures:
+            future.cancel()
+
+
+class ParallelSolver:
+    """Process pool that finds the same plays as `GaddagSolverState.find_all_plays`, using every core.
+
+    `path` is a GADDAG written by `lexicon.compile_lexicon(..., gaddag=True)`. Best-play searches run on a
+    worker of their own, so they never queue behind solves or simulations sharing `executor`."""
+
+    def __init__(self, path: str, workers: int | None = None) -> None:
+        self.lexicon     = lexicon.load_gaddag(path)
+        self.workers     = workers or os.cpu_count() or 1
+        self.executor    = ProcessPoolExecutor(self.workers, initializer=lexicon.attach, initargs=(path,))
+        self.best_player = ProcessPoolExecutor(1, initializer=lexicon.attach, initargs=(path,))
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.best_player.shutdown()
+
+    def __enter__(self) -> "ParallelSolver":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def find_all_options(self, board: Board, rack, analysis: BoardAnalysis | None = None) -> list[Any]:
+        """Same raw tuples, in the same order, as `GaddagSolverState.find_all_options`."""
+        return self._solve(board, rack, None, analysis)
+
+    def find_all_plays(self, board: Board, rack, board_blanks: set[CellCoord], analysis: BoardAnalysis | None = None) -> list[Play]:
+        """Same scored plays, in the same order, as `GaddagSolverState.find_all_plays`."""
+        return self._solve(board, rack, set(board_blanks), analysis)
+
+    def submit(self, board: Board, rack, board_blanks: set[CellCoord] | None, analysis: BoardAnalysis | None = None,
+               shares: int | None = None, key=None) -> SolveJob:
+        """Starts a solve and returns at once; scored plays with `board_blanks`, raw tuples without.
+
+        The board, rack and tables are copied to a file, so the caller may change them while the solve
+        runs; the file goes once every share is done or cancelled."""
+        if analysis is None:
+            analysis = BoardAnalysis(self.lexicon, board, board_blanks or ())
+        tables: Tables = {direction: (dict(analysis.cross_masks[direction]), dict(analysis.cross_scores[direction]))
+                          for direction in Direction}
+        anchors = analysis.anchor_list()
+
+        # Deal the (direction, anchor) pairs round robin so busy regions are spread over the workers
+        pairs   = [(direction, anchor_pos) for direction in Direction for anchor_pos in anchors]
+        shares  = max(1, min(shares or SHARES_PER_WORKER * self.workers, len(pairs)))
+        blanks  = None if board_blanks is None else set(board_blanks)
+        with tempfile.NamedTemporaryFile("wb", suffix=".position", delete=False) as file:
+            pickle.dump((board.copy(), list(rack), blanks, set(anchors), tables), file)
+        instrumented = instrument.recorder() is not None
+        futures = [self.executor.submit(_solve_share, file.name, pairs[i::shares], instrumented) for i in range(shares)]
+
+        def remove_position(_: Future[Share]) -> None:
+            if all(future.done() for future in futures):
+                with suppress(FileNotFoundError):
+                    os.remove(file.name)
+        for future in futures:
+            future.add_done_callback(remove_position)
+        return SolveJob(futures, len(pairs), key)
+
+    def submit_best_play(self, board: Board, board_blanks: set[CellCoord], racks: Sequence[Sequence[Letter]],
+                         exclude: Collection[str] = (), endgame_budget: float | None = None,
+                         leaves_path: str | None = None) -> Future[BestPlay]:
+        """Starts looking for the best play of `racks[0]` on the best-play worker; see `_best_play`."""
+        return self.best_player.submit(_best_play, board.copy(), set(board_blanks), [list(rack) for rack in racks],
+                                    frozenset(exclude), endgame_budget, leaves_path, instrument.recorder() is not None)
+
+    def _solve(self, board: Board, rack, board_blanks: set[CellCoord] | None, analysis: BoardAnalysis | None) -> list[Play]:
+        # one share per worker; the job puts each pair's plays back in its serial slot
+        return self.submit(board, rack, board_blanks, analysis, shares=self.workers).result()
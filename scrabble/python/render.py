@@ -0,0 +1,116 @@
+# Cached drawing for the game window.
+#
+# The window is split into regions (the board, the score boxes, the top words, ...). Each frame a
+# region is given a key made from the state it shows; only when the key changes is it described
+# again, as plain tuples of rectangles and labels, and only when that description changes are its
+# shapes, batched into one `arcade.ShapeElementList`, and its labels, batched into one pyglet batch,
+# rebuilt. So a frame in which nothing changed costs two draw calls per region. Emoji textures are
+# loaded once, when the window opens.
+
+import os
+from collections.abc import Callable, Hashable
+from typing import cast
+
+import arcade
+import pyglet
+
+Color   = tuple[int, int, int] | tuple[int, int, int, int]  # an `arcade.Color` as a tuple, so descriptions compare and hash
+Rect    = tuple[float, float, float, float, Color]         # center x, center y, width, height, fill color
+Outline = tuple[float, float, float, float, Color, float]  # center x, center y, width, height, color, border width
+Label   = tuple[str, float, float, Color, float]           # text, start x, baseline y, color, font size
+
+# emoji shown next to a definition mentioning the keyword, the first keyword found wins
+EMOJI_FILES = {
+    "fish":     "fish.png",
+    "tree":     "tree.png",
+    "insect":   "bug.png",
+    "flower":   "flower.png",
+    "plant":    "plant.png",
+    "monetary": "dollar.png",
+    "bird":     "bird.png",
+    "letter":   "letters.png",
+    "water":    "water.png",
+    "gem":      "gem.png",
+    "wine":     "wine.png",
+    "element":  "ptoe.png",
+    "chemical": "chemical.png",
+    "science":  "chemical.png",
+    "greek":    "greek.png",
+    "jewish":   "israel.png",
+    "hebrew":   "israel.png",
+    "mulsim":   "muslim.png",
+}
+
+
+class Region:
+    """One part of the window, its labels in `font_name`: `draw` it with a key of what it shows and a function
+    that describes it with `rect`, `outline` and `text`."""
+
+    def __init__(self, font_name: str) -> None:
+        self.font_name = font_name
+        self.rects: list[Rect]       = []
+        self.outlines: list[Outline] = []
+        self.labels: list[Label]     = []
+        self._key: Hashable = None  # key the description above was made for
+        self._built: tuple[list[Rect], list[Outline], list[Label]] | None = None  # description the batches below were built from
+        self._shapes: arcade.ShapeElementList[arcade.Shape] = arcade.ShapeElementList()
+        self._batch  = pyglet.graphics.Batch()
+        self._texts: dict[Label, pyglet.text.Label] = {}
+
+    def rect(self, x: float, y: float, width: float, height: float, color: arcade.Color) -> None:
+        self.rects.append((x, y, width, height, _color(color)))
+
+    def outline(self, x: float, y: float, width: float, height: float, color: arcade.Color, border_width: float) -> None:
+        self.outlines.append((x, y, width, height, _color(color), border_width))
+
+    def text(self, text: str, x: float, y: float, color: arcade.Color, font_size: float) -> None:
+        if text.strip():
+            self.labels.append((text, x, y, _color(color), font_size))
+
+    def draw(self, key: Hashable, describe: Callable[["Region"], None]) -> None:
+        """Draws the region; `describe` is only called, and the batches only rebuilt, when `key` differs from
+        the last frame's."""
+        if key != self._key or self._built is None:
+            self.rects, self.outlines, self.labels = [], [], []
+            describe(self)
+            self._key = key
+            if (self.rects, self.outlines, self.labels) != self._built:
+                self._build()
+        self._shapes.draw()
+        if self._texts:
+            with arcade.get_window().ctx.pyglet_rendering():
+                self._batch.draw()
+
+    def _build(self) -> None:
+        self._shapes = arcade.ShapeElementList()
+        for x, y, width, height, color in self.rects:
+            self._shapes.append(arcade.create_rectangle_filled(x, y, width, height, color))
+        for x, y, width, height, color, border_width in self.outlines:
+            self._shapes.append(arcade.create_rectangle_outline(x, y, width, height, color, border_width))
+        # labels that did not change stay in the batch, so their glyph layout is not redone
+        labels = set(self.labels)
+        for label in self._texts.keys() - labels:
+            self._texts.pop(label).delete()
+        for label in labels - self._texts.keys():
+            text, x, y, color, font_size = label
+            self._texts[label] = pyglet.text.Label(text, x=x, y=y, color=arcade.get_four_byte_color(color), font_size=font_size,
+                                                   font_name=self.font_name, bold=True, batch=self._batch)
+        self._built = (self.rects, self.outlines, self.labels)
+
+
+def _color(color: arcade.Color) -> Color:
+    return cast(Color, tuple(color))
+
+
+class Emojis:
+    """Emoji textures, loaded once, and the one to show for a definition."""
+
+    def __init__(self, directory: str) -> None:
+        self.textures = {keyword: arcade.load_texture(os.path.join(directory, file)) for keyword, file in EMOJI_FILES.items()}
+        self._chosen: dict[str, arcade.Texture | None] = {}
+
+    def for_definition(self, definition: str) -> arcade.Texture | None:
+        if definition not in self._chosen:
+            lowered = definition.lower()
+            self._chosen[definition] = next((texture for keyword, texture in self.textures.items() if keyword in lowered), None)
+        return self._chosen[definition]
@@ -0,0 +1,185 @@
+# Monte Carlo simulation of candidate plays: each candidate is played out for a few plies against
+# opponent racks drawn from the unseen tiles, and candidates are ranked by their average equity.
+#
+# Iterations run in batches on a process pool, its own or one shared with a `ParallelSolver`. Within
+# a batch every candidate sees the same sampled racks and bags, so the differences between candidates
+# are not swamped by the luck of the draw. A simulation can be left running (`start`) and polled, which
+# is how the game window keeps drawing meanwhile.
+
+import math
+import os
+import random
+import time
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import leaves
+import lexicon
+from analysis import BoardAnalysis
+from board import Board, CellCoord, Letter
+from engine import Z_95, Game, greedy
+from scoring import RACK_SIZE, Play
+
+DEFAULT_PLIES       = 2
+DEFAULT_TIME_BUDGET = 5.0  # seconds
+BATCH_SIZE          = 4    # iterations per candidate in one task
+MIN_ITERATIONS      = 16   # iterations every candidate gets before stopping early
+
+Position = tuple[Board, set[CellCoord], list[Letter], list[Letter]]  # board, board blanks, rack, unseen tiles
+
+
+@dataclass
+class Candidate:
+    play: Play
+    equities: list[float] = field(default_factory=list)
+
+    @property
+    def mean(self) -> float:
+        return sum(self.equities) / len(self.equities) if self.equities else -math.inf
+
+    @property
+    def stderr(self) -> float:
+        n = len(self.equities)
+        if n < 2:
+            return math.inf
+        mean = self.mean
+        return math.sqrt(sum((equity - mean) ** 2 for equity in self.equities) / (n - 1) / n)
+
+
+def play_out(analysis: BoardAnalysis, blanks: set[CellCoord], rack: Sequence[Letter], unseen: Sequence[Letter],
+             play: Play, plies: int, rng: random.Random, leave_table: leaves.LeaveTable | None = None) -> float:
+    """Makes `play`, then lets greedy bots play `plies - 1` more moves; returns the mover's spread over those plies,
+    plus the value of each side's last leave when a `leave_table` is given and tiles are left to draw."""
+    pool = list(unseen)
+    rng.shuffle(pool)
+    game = Game.from_position(analysis, blanks, [list(rack), pool[:RACK_SIZE]], pool[RACK_SIZE:], rng)
+    last = [play, None]
+    game.apply(play)
+    for _ in range(plies - 1):
+        if game.is_over():
+            break
+        player       = game.turn
+        last[player] = greedy(game)
+        game.apply(last[player])
+    if game.is_over():
+        game.finish()
+    equity: float = game.scores[0] - game.scores[1]
+    if leave_table is not None and game.bag:
+        equity += sum(sign * leave_table.value(move.leave) for sign, move in zip((1, -1), last) if move is not None)
+    return equity
+
+
+def _simulate_batch(position: Position, plays: Sequence[Play], seeds: Sequence[int], plies: int,
+                    leaves_path: str | None) -> list[list[float]]:
+    """Equities of every play, one per seed; all plays share the racks drawn for a seed."""
+    board, blanks, rack, unseen = position
+    analysis    = BoardAnalysis(lexicon.attached(), board, blanks)
+    leave_table = leaves.shared(leaves_path) if leaves_path else None
+    return [[play_out(analysis, blanks, rack, unseen, play, plies, random.Random(seed), leave_table) for seed in seeds]
+            for play in plays]
+
+
+def leader_is_clear(candidates: Sequence[Candidate], z: float = Z_95) -> bool:
+    """True once the best candidate's confidence interval lies above everyone else's."""
+    if any(len(candidate.equities) < MIN_ITERATIONS for candidate in candidates):
+        return False
+    best, *rest = sorted(candidates, key=lambda candidate: candidate.mean, reverse=True)
+    return all(best.mean - z * best.stderr > other.mean + z * other.stderr for other in rest)
+
+
+class SimulationJob:
+    """A simulation running on a `Simulator`'s pool; each `poll` takes in the finished batches and hands
+    out new ones until the iterations or the time budget run out, or the leader is clear."""
+
+    def __init__(self, simulator: "Simulator", position: Position, plays: Sequence[Play], plies: int, iterations: int,
+                 time_budget: float, seed: int) -> None:
+        self.simulator = simulator
+        self.position  = position
+        self.plays     = plays
+        self.plies     = plies
+        self.deadline  = time.monotonic() + time_budget
+        self.pending: set[Future[list[list[float]]]] = set()
+        self._candidates = [Candidate(play) for play in plays]
+        self._seeds      = iter(range(seed, seed + iterations, BATCH_SIZE))
+        self._end        = seed + iterations
+        self._stopped    = False
+        for _ in range(2 * simulator.workers):
+            self._submit()
+
+    def _submit(self) -> None:
+        start = next(self._seeds, None)
+        if start is not None:
+            batch = range(start, min(start + BATCH_SIZE, self._end))
+            self.pending.add(self.simulator.executor.submit(_simulate_batch, self.position, self.plays, batch, self.plies,
+                                                            self.simulator.leaves_path))
+
+    def poll(self) -> bool:
+        """Collects the batches finished since the last call; True if there were any."""
+        done = {future for future in self.pending if future.done()}
+        self.pending -= done
+        for future in done:
+            if not future.cancelled():
+                for candidate, equities in zip(self._candidates, future.result()):
+                    candidate.equities += equities
+        if not self._stopped and (time.monotonic() >= self.deadline or leader_is_clear(self._candidates)):
+            self.cancel()
+        if not self._stopped:
+            for _ in done:
+                self._submit()
+        return bool(done)
+
+    def done(self) -> bool:
+        return self._stopped or not self.pending
+
+    def candidates(self) -> list[Candidate]:
+        """The candidates, best average equity first, over the iterations collected so far."""
+        return sorted(self._candidates, key=lambda candidate: candidate.mean, reverse=True)
+
+    def cancel(self) -> None:
+        """Stops handing out batches and drops the ones no worker has started; running ones are ignored."""
+        self._stopped = True
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+
+
+class Simulator:
+    """Process pool that simulates candidate plays; `path` is a GADDAG written by `lexicon.compile_lexicon`.
+
+    With a `leaves_path` (see `learn_leaves.py`) the leaves left at the end of a play-out count towards its equity.
+    With an `executor` whose workers have attached the lexicon (a `ParallelSolver`'s), the batches run on it
+    instead of a pool of its own."""
+
+    def __init__(self, path: str, workers: int | None = None, leaves_path: str | None = None,
+                 executor: ProcessPoolExecutor | None = None) -> None:
+        self.workers     = workers or os.cpu_count() or 1
+        self.leaves_path = leaves_path
+        self.own_pool    = executor is None
+        self.executor    = executor or ProcessPoolExecutor(self.workers, initializer=lexicon.attach, initargs=(path,))
+
+    def close(self) -> None:
+        if self.own_pool:
+            self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> "Simulator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self, position: Position, plays: Sequence[Play], plies: int = DEFAULT_PLIES, iterations: int = 1000,
+              time_budget: float = DEFAULT_TIME_BUDGET, seed: int = 0) -> SimulationJob:
+        """Starts simulating each of `plays` up to `iterations` times and returns at once; see `simulate`."""
+        return SimulationJob(self, position, plays, plies, iterations, time_budget, seed)
+
+    def simulate(self, position: Position, plays: Sequence[Play], plies: int = DEFAULT_PLIES, iterations: int = 1000,
+                 time_budget: float = DEFAULT_TIME_BUDGET, seed: int = 0) -> list[Candidate]:
+        """Simulates each of `plays` up to `iterations` times, best average equity first.
+
+        Stops early once the leader is clear, and returns whatever has finished when `time_budget` runs out."""
+        job = self.start(position, plays, plies, iterations, time_budget, seed)
+        while not job.done():
+            wait(job.pending, timeout=max(0.0, job.deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            job.poll()
+        return job.candidates()
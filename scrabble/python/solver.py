@@ -1,10 +1,85 @@
 # Inital code taken from https://github.com/boringcactus/Appel-Jacobson-scrabble/blob/canon/board.py
 
-from collections import defaultdict
-from typing import Any
+import heapq
+from collections import OrderedDict, defaultdict
+from collections.abc import Container, Iterable, Iterator
+from typing import TYPE_CHECKING, Any
 
-from board import Board, CellCoord, Direction, Letter, Position
-from trie import Trie, TrieNode
+import numpy as np
+
+import instrument
+from board import EMPTY, SIZE, Board, CellCoord, Direction, Letter, Position
+from lexicon import GADDAG_SEP, Dawg, DawgNode, Gaddag
+from scoring import LETTER_MULTIPLIERS, TILE_SCORE, WORD_MULTIPLIERS, Play
+
+if TYPE_CHECKING:
+    from analysis import BoardAnalysis
+
+ALPHABET        = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+BLANK           = 26   # rack slot that counts blanks
+ALL_LETTERS     = (1 << 26) - 1
+LETTER_BITS     = {letter: 1 << i for i, letter in enumerate(ALPHABET)}
+LETTER_SLOTS    = {letter: i for i, letter in enumerate(ALPHABET)} | {" ": BLANK}
+SLOT_TILES      = ALPHABET + " "  # tile of each rack slot
+PLAY_CACHE_SIZE = 256  # positions kept by a `PlayCache`
+
+PlayKey = tuple[int, frozenset[CellCoord], str]  # board hash, blanks on the board, sorted rack: a `PlayCache` key
+
+# tables indexed by the letter codes stored in the lexicon arrays; the GADDAG separator has no bit
+SEP_CODE     = ord(GADDAG_SEP)
+CODE_BITS    = [LETTER_BITS.get(chr(code), 0) for code in range(256)]
+CODE_SLOTS   = [LETTER_SLOTS.get(chr(code), BLANK) for code in range(256)]
+CODE_LETTERS = [chr(code) for code in range(256)]
+# board squares of every row (ACROSS) and column (DOWN), in order along the line
+LINE_SQUARES = {Direction.ACROSS: [[(row, col) for col in range(SIZE)] for row in range(SIZE)],
+                Direction.DOWN:   [[(row, col) for row in range(SIZE)] for col in range(SIZE)]}
+
+
+def rack_counts(rack) -> list[int]:
+    """27-slot count array: one slot per letter, then blanks."""
+    counts = [0] * 27
+    for tile in rack:
+        counts[LETTER_SLOTS[tile]] += 1
+    return counts
+
+
+def letters_mask(letters) -> int:
+    mask = 0
+    for letter in letters:
+        mask |= LETTER_BITS[letter]
+    return mask
+
+
+def mask_letters(mask: int) -> set[Letter]:
+    return {letter for letter in ALPHABET if mask & LETTER_BITS[letter]}
+
+
+def cross_check_planes(dictionary: Dawg, board: Board) -> np.ndarray:
+    """Cross-check masks of the whole board, both play directions at once, as a 15x15x2 array indexed by
+    (row, col, direction - 1): the letters allowed on each empty square by the word crossing a play in
+    that direction, 0 on filled squares.
+
+    numpy only finds the runs of tiles before and after every square, for all lines at once; the squares
+    next to a run are then looked up one by one through the lexicon's memoized `hook_mask`, in Python."""
+    filled = np.frombuffer(board._rows, dtype=np.uint8).reshape(SIZE, SIZE) != EMPTY
+    masks  = np.where(filled, 0, ALL_LETTERS).astype(np.uint32)[:, :, None].repeat(2, axis=2)
+    for direction in Direction:
+        # crossing words run down the columns for ACROSS plays and along the rows for DOWN plays;
+        # lines[i, j] is square j of line i
+        cross  = Direction.DOWN if direction == Direction.ACROSS else Direction.ACROSS
+        lines  = filled.T if direction == Direction.ACROSS else filled
+        before = np.zeros((SIZE, SIZE), dtype=np.int64)
+        after  = np.zeros((SIZE, SIZE), dtype=np.int64)
+        for j in range(1, SIZE):
+            before[:, j] = (before[:, j - 1] + 1) * lines[:, j - 1]
+        for j in range(SIZE - 2, -1, -1):
+            after[:, j] = (after[:, j + 1] + 1) * lines[:, j + 1]
+        strings = [board.line(cross, i) for i in range(SIZE)]
+        for i, j in zip(*np.nonzero(~lines & ((before > 0) | (after > 0)))):
+            line, start, end = strings[i], j - before[i, j], j + 1 + after[i, j]
+            row, col         = (j, i) if direction == Direction.ACROSS else (i, j)
+            masks[row, col, direction - 1] = dictionary.hook_mask(line[start:j], line[j + 1:end])
+    return masks
 
 
 class SolverState:
@@ -15,7 +90,7 @@ class SolverState:
     direction: Direction | None
     plays: list[Any]  # This should be better defined: List[Tuple[Position, str, Set[CellCoord]]] or List[Play] as defined in main.py???
 
-    def __init__(self, dictionary: Trie, board: Board, rack): # What is the type of rack?
+    def __init__(self, dictionary: Dawg, board: Board, rack): # What is the type of rack?
         self.dictionary = dictionary
         self.board = board
         self.original_rack = rack.copy()
@@ -23,6 +98,8 @@ class SolverState:
         self.cross_check_results = None
         self.direction = None
         self.plays = []
+        self.cross_planes: tuple[int, np.ndarray] | None = None  # board hash and `cross_check_planes` of that board
+        instrument.attach(self)
 
     def before(self, pos: CellCoord) -> CellCoord:
         row, col = pos
@@ -73,56 +150,34 @@ class SolverState:
             play_pos = self.before(play_pos)
 
     def cross_check_for_display(self, on_rack: bool): # -> ??? Dict[CellCoord, Set[str]] ???
-        self.direction = Direction.ACROSS
-        a = self.cross_check()
-        self.direction = Direction.DOWN
-        b = self.cross_check()
+        masks = self.cross_check_planes()
+        both  = (masks[:, :, 0] & masks[:, :, 1]).tolist()
+        rack  = letters_mask(tile for tile in self.rack if tile != " ") if on_rack else ALL_LETTERS
         result = defaultdict(set)
-        for pos in self.find_anchors():
-            result[pos] = a[pos] & b[pos] & set(self.rack) if on_rack else a[pos] & b[pos]
+        for row, col in self.find_anchors():
+            result[(row, col)] = mask_letters(both[row][col] & rack)
         return result
 
     def cross_check(self) -> dict[CellCoord, set[Letter]]:
-        result: dict[CellCoord, set[Letter]] = dict()
-        for pos in self.board.all_positions():
-            if self.board.is_filled(pos):
-                result[pos] = set()
-            letters_before = ""
-            scan_pos = pos
-            while self.board.is_filled(self.before_cross(scan_pos)):
-                scan_pos = self.before_cross(scan_pos)
-                letters_before = self.board.tile(scan_pos) + letters_before
-            letters_after = ""
-            scan_pos = pos
-            while self.board.is_filled(self.after_cross(scan_pos)):
-                scan_pos = self.after_cross(scan_pos)
-                letters_after = letters_after + self.board.tile(scan_pos)
-            if len(letters_before) == 0 and len(letters_after) == 0:
-                legal_here = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
-            else:
-                legal_here = set()
-                for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-                    word_formed = letters_before + letter + letters_after
-                    if self.dictionary.is_word(word_formed):
-                        legal_here.add(letter)
-            result[pos] = legal_here
-        return result
+        return {pos: mask_letters(mask) for pos, mask in self.cross_check_masks().items()}
+
+    def cross_check_planes(self) -> np.ndarray:
+        """`cross_check_planes` of the board, worked out once per board version for both directions."""
+        if self.cross_planes is None or self.cross_planes[0] != self.board.hash:
+            self.cross_planes = (self.board.hash, cross_check_planes(self.dictionary, self.board))
+        return self.cross_planes[1]
+
+    def cross_check_masks(self) -> dict[CellCoord, int]:
+        assert self.direction is not None
+        masks = self.cross_check_planes()[:, :, self.direction - 1].tolist()
+        return {(row, col): masks[row][col] for row, col in self.board.all_positions()}
 
     def find_anchors(self) -> list[CellCoord]:
         if self.board.is_first_turn():
             return [(7, 7)]
-        anchors = []
-        for pos in self.board.all_positions():
-            empty = self.board.is_empty(pos)
-            neighbor_filled = self.board.is_filled(self.before(pos)) or \
-                              self.board.is_filled(self.after(pos)) or \
-                              self.board.is_filled(self.before_cross(pos)) or \
-                              self.board.is_filled(self.after_cross(pos))
-            if empty and neighbor_filled:
-                anchors.append(pos)
-        return anchors
+        return self.board.anchors()
 
-    def before_part(self, partial_word: str, current_node: TrieNode, anchor_pos: CellCoord, limit: int) -> None:
+    def before_part(self, partial_word: str, current_node: DawgNode, anchor_pos: CellCoord, limit: int) -> None:
         self.extend_after(partial_word, current_node, anchor_pos, False)
         if limit > 0:
             for next_letter in current_node.children.keys():
@@ -137,7 +192,7 @@ class SolverState:
                     )
                     self.rack.append(letter_to_add_back)
 
-    def extend_after(self, partial_word: str, current_node: TrieNode, next_pos: CellCoord, anchor_filled: bool) -> None:
+    def extend_after(self, partial_word: str, current_node: DawgNode, next_pos: CellCoord, anchor_filled: bool) -> None:
         if (self.board.is_empty(next_pos) or not self.board.in_bounds(next_pos)) and \
             current_node.is_word and anchor_filled:
             self.legal_move(partial_word, self.before(next_pos))
@@ -193,3 +248,418 @@ class SolverState:
                         scan_pos = self.before(scan_pos)
                     self.before_part("", self.dictionary.root, anchor_pos, limit)
         return self.plays
+
+
+class GaddagSolverState(SolverState):
+    """Finds the same plays as `SolverState`, but walks a GADDAG outwards from each anchor.
+
+    A word is grown leftwards from its anchor (never placing a tile on another anchor, so each
+    play is generated once, from its leftmost anchor), then after the separator rightwards.
+    The rack is a count array and cross-checks are letter bitmasks, so testing a letter is an
+    AND plus an index, with no list copies in the recursion. The search runs along the anchor's
+    line only, so squares are offsets into it, and lexicon nodes are ids into its arrays."""
+    anchors: set[CellCoord]
+    placed: list[tuple[CellCoord, Letter]]
+    tile_counts: list[int]
+    rack_blanks: int
+    rack_mask: int                  # letters with at least one natural tile left on the rack
+    line: bytes                     # the anchor's row or column, "." for empty squares
+    squares: list[CellCoord]        # board square of each offset of `line`
+    line_masks: list[int]           # cross-check mask of each offset of `line`
+    line_anchors: list[bool]
+    line_tables: dict[tuple[Direction, int], tuple[bytes, list[int], list[bool]]]  # `line`, `line_masks` and `line_anchors` of the lines used so far
+    anchor_offset: int
+    cross_masks: dict[CellCoord, int]
+    cross_scores: dict[CellCoord, int]
+    board_blanks: set[CellCoord] | None
+    score_floor: int                # scored plays below it are dropped as they are found
+    analysis: "BoardAnalysis | None"
+
+    def __init__(self, dictionary: Gaddag, board: Board, rack, analysis: "BoardAnalysis | None" = None):
+        super().__init__(dictionary, board, rack)
+        self.analysis     = analysis  # when given, its anchors and cross-checks are used instead of rescanning the board
+        self.anchors      = set()
+        self.line_tables  = {}
+        self.placed       = []
+        self.tile_counts  = rack_counts(rack)
+        self.rack_blanks  = self.tile_counts[BLANK]
+        self.rack_mask    = letters_mask(set(rack) - {" "})
+        self.first_edge, self.edge_letters, self.edge_targets, self.terminal = dictionary.arrays()
+        self.cross_masks  = {}
+        self.cross_scores = {}
+        self.board_blanks = None  # blanks already on the board (screen coordinates); set when scoring plays
+        self.score_floor  = 0
+
+    def cross_word_scores(self, anchors: list[CellCoord]) -> dict[CellCoord, int]:
+        """Face value of the existing tiles in the word crossing each anchor that has one."""
+        assert self.board_blanks is not None
+        result = {}
+        for pos in anchors:
+            if not (self.board.is_filled(self.before_cross(pos)) or self.board.is_filled(self.after_cross(pos))):
+                continue
+            score = 0
+            for step in (self.before_cross, self.after_cross):
+                scan_pos = step(pos)
+                while self.board.is_filled(scan_pos):
+                    row, col = scan_pos
+                    if (14 - row, col) not in self.board_blanks:
+                        score += TILE_SCORE[self.board.tile(scan_pos)]
+                    scan_pos = step(scan_pos)
+            result[pos] = score
+        return result
+
+    def score_play(self, blanks: set[CellCoord]) -> Play | None:
+        """Scores the tiles in `self.placed` from the multiplier and cross-score tables; no dictionary lookups.
+        None when the play scores below `score_floor`, found before its word and leave are put together."""
+        assert self.direction is not None and self.board_blanks is not None
+        along  = 1 if self.direction == Direction.ACROSS else 0
+        placed = {pos[along]: (pos, letter) for pos, letter in self.placed}
+        line   = self.line
+        first  = start = min(placed)
+        while start > 0 and line[start - 1] != EMPTY:
+            start -= 1
+        end = max(placed) + 1
+        while end < SIZE and line[end] != EMPTY:
+            end += 1
+        main_score, word_mult, cross_score = 0, 1, 0
+        for offset in range(start, end):
+            if offset in placed:
+                pos, letter = placed[offset]
+                row, col    = pos
+                value       = 0 if (14 - row, col) in blanks else TILE_SCORE[letter] * LETTER_MULTIPLIERS[pos]
+                main_score += value
+                word_mult  *= WORD_MULTIPLIERS[pos]
+                if pos in self.cross_scores:
+                    cross_score += (self.cross_scores[pos] + value) * WORD_MULTIPLIERS[pos]
+            else:
+                row, col = self.squares[offset]
+                if (14 - row, col) not in self.board_blanks:
+                    main_score += TILE_SCORE[chr(line[offset])]
+        is_bingo = len(placed) == 7
+        score    = main_score * word_mult + cross_score + (50 if is_bingo else 0)
+        if score < self.score_floor:
+            return None
+        word = bytearray(line[start:end])
+        for offset, (_, letter) in placed.items():
+            word[offset - start] = ord(letter)
+        leave    = "".join(SLOT_TILES[slot] * count for slot, count in enumerate(self.tile_counts) if count)
+        row, col = self.squares[first]
+        return Play(score, word.decode(), Position(self.direction, 14 - row, col), is_bingo, blanks, leave)
+
+    def assign_blanks(self) -> set[CellCoord]:
+        """Screen coordinates of the placed tiles that have to be blanks.
+
+        Only letters placed more often than the rack holds them need a blank, and any of their
+        squares could take it. Raw plays put blanks on the leftmost squares, matching `legal_move`;
+        scored plays put them where the tile is worth least (lowest letter multiplier, counted once
+        for the main word and once more for a cross word), leftmost on ties. Every assignment of
+        the same placement is therefore collapsed into the single highest-scoring one."""
+        natural = rack_counts(self.original_rack)
+        squares_by_letter = defaultdict(list)
+        for pos, letter in self.placed:
+            squares_by_letter[letter].append(pos)
+        word_mult = 1
+        for pos, _ in self.placed:
+            word_mult *= WORD_MULTIPLIERS[pos]
+        blanks: set[CellCoord] = set()
+        for letter, squares in squares_by_letter.items():
+            extra = len(squares) - natural[LETTER_SLOTS[letter]]
+            if extra <= 0:
+                continue
+            if self.board_blanks is None:
+                squares.sort()
+            else:
+                squares.sort(key=lambda pos: (LETTER_MULTIPLIERS[pos] * (word_mult + (WORD_MULTIPLIERS[pos] if pos in self.cross_scores else 0)), pos))
+            blanks.update((14 - row, col) for row, col in squares[:extra])
+        return blanks
+
+    def record_play(self) -> None:
+        blanks = self.assign_blanks() if self.tile_counts[BLANK] < self.rack_blanks else set()
+        if self.board_blanks is not None:
+            play = self.score_play(blanks)
+            if play is not None:
+                self.plays.append(play)
+            return
+        assert self.direction is not None
+        placed   = sorted(self.placed)
+        row, col = placed[0][0]
+        self.plays.append((Position(dir=self.direction, row=row, col=col), "".join(letter for _, letter in placed), blanks))
+
+    def extend_before(self, offset: int, node: int) -> None:
+        """`node` has consumed the tile at `offset`; grow leftwards, or switch to the right of the anchor."""
+        before = offset - 1
+        if before >= 0 and self.line[before] != EMPTY:
+            child = self.dictionary.child(node, self.line[before])
+            if child >= 0:
+                self.extend_before(before, child)
+            return
+        start = self.first_edge[node]
+        if start < self.first_edge[node + 1] and self.edge_letters[start] == SEP_CODE:
+            self.extend_beyond(self.anchor_offset + 1, self.edge_targets[start])
+        if before >= 0 and not self.line_anchors[before]:
+            counts = self.tile_counts
+            legal  = self.line_masks[before] & (ALL_LETTERS if counts[BLANK] else self.rack_mask)
+            if legal:
+                letters, targets, square = self.edge_letters, self.edge_targets, self.squares[before]
+                for edge in range(start, self.first_edge[node + 1]):
+                    code = letters[edge]
+                    bit  = CODE_BITS[code]
+                    if bit & legal:
+                        slot = CODE_SLOTS[code] if counts[CODE_SLOTS[code]] else BLANK
+                        counts[slot] -= 1
+                        if slot != BLANK and not counts[slot]:
+                            self.rack_mask ^= bit
+                        self.placed.append((square, CODE_LETTERS[code]))
+                        self.extend_before(before, targets[edge])
+                        self.placed.pop()
+                        if slot != BLANK and not counts[slot]:
+                            self.rack_mask ^= bit
+                        counts[slot] += 1
+
+    def extend_beyond(self, offset: int, node: int) -> None:
+        if offset < SIZE and self.line[offset] != EMPTY:
+            child = self.dictionary.child(node, self.line[offset])
+            if child >= 0:
+                self.extend_beyond(offset + 1, child)
+            return
+        if self.terminal[node]:
+            self.record_play()
+        if offset < SIZE:
+            counts = self.tile_counts
+            legal  = self.line_masks[offset] & (ALL_LETTERS if counts[BLANK] else self.rack_mask)
+            if legal:
+                letters, targets, square = self.edge_letters, self.edge_targets, self.squares[offset]
+                for edge in range(self.first_edge[node], self.first_edge[node + 1]):
+                    code = letters[edge]
+                    bit  = CODE_BITS[code]
+                    if bit & legal:
+                        slot = CODE_SLOTS[code] if counts[CODE_SLOTS[code]] else BLANK
+                        counts[slot] -= 1
+                        if slot != BLANK and not counts[slot]:
+                            self.rack_mask ^= bit
+                        self.placed.append((square, CODE_LETTERS[code]))
+                        self.extend_beyond(offset + 1, targets[edge])
+                        self.placed.pop()
+                        if slot != BLANK and not counts[slot]:
+                            self.rack_mask ^= bit
+                        counts[slot] += 1
+
+    def rejections(self, name: str, args: tuple[Any, ...]) -> tuple[int, int]:
+        """For instrumentation, after a call to `generate_at`, `extend_before` or `extend_beyond` (`name`) with `args`:
+        what the search turned down on the square that call looked at, the anchor or the next one along. That is
+        1 when the tile already there cannot continue the word, and the number of rack letters its cross-check ruled out."""
+        if name == "generate_at":
+            offset, node = self.anchor_offset, 0
+        else:
+            offset, node = args
+            if name == "extend_before":
+                offset -= 1
+                if offset >= 0 and self.line_anchors[offset]:  # the leftward search stops short of another anchor
+                    return 0, 0
+        if not 0 <= offset < SIZE:
+            return 0, 0
+        if self.line[offset] != EMPTY:
+            return int(self.dictionary.child(node, self.line[offset]) < 0), 0
+        ruled_out = (ALL_LETTERS if self.tile_counts[BLANK] else self.rack_mask) & ~self.line_masks[offset]
+        letters   = self.edge_letters
+        return 0, sum(1 for edge in range(self.first_edge[node], self.first_edge[node + 1]) if CODE_BITS[letters[edge]] & ruled_out)
+
+    def use_direction(self, direction: Direction) -> list[CellCoord]:
+        """Points the generator at `direction`'s anchors and tables; returns the anchors."""
+        self.direction = direction
+        if self.analysis is None:
+            anchors = self.find_anchors()
+            self.cross_masks = self.cross_check_masks()
+        else:
+            anchors = self.analysis.anchor_list()
+            self.cross_masks = self.analysis.cross_masks[direction]
+        self.anchors     = set(anchors)
+        self.line_tables = {}
+        if self.board_blanks is not None:
+            self.cross_scores = self.cross_word_scores(anchors) if self.analysis is None else self.analysis.cross_scores[direction]
+        return anchors
+
+    def generate_at(self, anchor_pos: CellCoord) -> None:
+        assert self.direction is not None  # set by `use_direction`
+        row, col           = anchor_pos
+        index, offset      = (row, col) if self.direction == Direction.ACROSS else (col, row)
+        self.squares       = LINE_SQUARES[self.direction][index]
+        if (self.direction, index) not in self.line_tables:
+            self.line_tables[self.direction, index] = (self.board.line(self.direction, index).encode(),
+                                       [self.cross_masks[pos] for pos in self.squares],
+                                       [pos in self.anchors for pos in self.squares])
+        self.line, self.line_masks, self.line_anchors = self.line_tables[self.direction, index]
+        self.anchor_offset = offset
+        counts = self.tile_counts
+        legal  = self.line_masks[offset] & (ALL_LETTERS if counts[BLANK] else self.rack_mask)
+        if not legal:
+            return
+        for code, target in self.dictionary.edges(0):
+            bit = CODE_BITS[code]
+            if bit & legal:
+                slot = CODE_SLOTS[code] if counts[CODE_SLOTS[code]] else BLANK
+                counts[slot] -= 1
+                if slot != BLANK and not counts[slot]:
+                    self.rack_mask ^= bit
+                self.placed.append((anchor_pos, CODE_LETTERS[code]))
+                self.extend_before(offset, target)
+                self.placed.pop()
+                if slot != BLANK and not counts[slot]:
+                    self.rack_mask ^= bit
+                counts[slot] += 1
+
+    def find_all_options(self):
+        for direction in Direction:
+            for anchor_pos in self.use_direction(direction):
+                self.generate_at(anchor_pos)
+        return self.plays
+
+    def find_all_plays(self, board_blanks: set[CellCoord]) -> list[Play]:
+        """Like `find_all_options`, but every play comes out already scored as a `Play`.
+
+        `board_blanks` are the blanks already on the board, in the screen coordinates used by `Play`;
+        with an analysis attached they must match the blanks it was given."""
+        self.board_blanks = board_blanks
+        self.score_floor  = 0
+        plays: list[Play] = self.find_all_options()
+        return plays
+
+    def iter_plays(self, board_blanks: set[CellCoord], min_score: int = 0, directions: Iterable[Direction] = tuple(Direction),
+                   region: Container[CellCoord] | None = None, exclude: Container[str] = ()) -> Iterator[Play]:
+        """Yields scored plays as they are found, one anchor at a time, so callers can stop early.
+
+        Only plays scoring at least `min_score`, made in one of `directions`, starting from an anchor
+        in `region` (board coordinates; None means anywhere) and whose word is not in `exclude` are
+        yielded. Anchors whose `anchor_bound` is below `min_score` are skipped without searching."""
+        self.board_blanks = board_blanks
+        self.score_floor  = min_score
+        for direction in directions:
+            for anchor_pos in self.use_direction(direction):
+                if region is not None and anchor_pos not in region:
+                    continue
+                if min_score and self.anchor_bound(anchor_pos) < min_score:
+                    continue
+                self.plays = []
+                self.generate_at(anchor_pos)
+                for play in self.plays:
+                    if play.word not in exclude:
+                        yield play
+        self.plays = []
+
+    def anchor_bound(self, anchor_pos: CellCoord) -> int:
+        """Upper bound on the score of any play from `anchor_pos` in the current direction.
+
+        The squares a play could cover are collected (rack-sized runs of empty squares either
+        side, plus the tiles between and after them); the rack's values are paired with the best
+        letter multipliers, the best word multipliers are multiplied together, and every cross
+        word is assumed to get the rack's best tile."""
+        rack_size = len(self.original_rack)
+        empties   = [anchor_pos]
+        existing  = 0
+        scan_pos  = self.before(anchor_pos)
+        while self.board.is_filled(scan_pos):
+            existing += TILE_SCORE[self.board.tile(scan_pos)]
+            scan_pos  = self.before(scan_pos)
+        while len(empties) < rack_size and self.board.is_empty(scan_pos) and scan_pos not in self.anchors:
+            empties.append(scan_pos)
+            scan_pos = self.before(scan_pos)
+        right_empties = 1
+        scan_pos = self.after(anchor_pos)
+        while self.board.in_bounds(scan_pos):
+            if self.board.is_filled(scan_pos):
+                existing += TILE_SCORE[self.board.tile(scan_pos)]
+            elif right_empties == rack_size:
+                break
+            else:
+                empties.append(scan_pos)
+                right_empties += 1
+            scan_pos = self.after(scan_pos)
+
+        tiles       = min(rack_size, len(empties))
+        values      = sorted((TILE_SCORE[tile] for tile in self.original_rack), reverse=True)
+        letter_mult = sorted((LETTER_MULTIPLIERS[pos] for pos in empties), reverse=True)
+        word_mult   = 1
+        for mult in sorted((WORD_MULTIPLIERS[pos] for pos in empties), reverse=True)[:tiles]:
+            word_mult *= mult
+        cross = sorted(((self.cross_scores[pos] + values[0] * LETTER_MULTIPLIERS[pos]) * WORD_MULTIPLIERS[pos]
+                        for pos in empties if pos in self.cross_scores), reverse=True)
+        main  = sum(value * mult for value, mult in zip(values, letter_mult)) + existing
+        return main * word_mult + sum(cross[:tiles]) + (50 if tiles == 7 else 0)
+
+    def find_top_k(self, k: int, board_blanks: set[CellCoord], exclude: Container[str] = ()) -> list[Play]:
+        """The `k` best plays (highest first) whose word is not in `exclude`.
+
+        Anchors of both directions are searched in order of `anchor_bound`, and the search stops
+        once no remaining anchor can beat the k-th best play found so far; plays scoring below it
+        are dropped before their word and leave are built. Pruning is per anchor only: a bound on
+        partial placements, checked at every step of the search, cut too few branches to pay for
+        itself."""
+        self.board_blanks = board_blanks
+        self.score_floor  = 0
+        tables = {}
+        bounds = []
+        for direction in Direction:
+            anchors = self.use_direction(direction)
+            tables[direction] = (self.cross_masks, self.cross_scores, self.anchors)
+            bounds += [(self.anchor_bound(anchor_pos), direction, anchor_pos) for anchor_pos in anchors]
+        bounds.sort(reverse=True)
+
+        best: list[Play] = []  # min-heap holding the k best plays so far
+        for bound, direction, anchor_pos in bounds:
+            if len(best) == k and bound < best[0].score:
+                break
+            self.direction = direction
+            self.cross_masks, self.cross_scores, self.anchors = tables[direction]
+            self.plays = []
+            self.generate_at(anchor_pos)
+            for play in self.plays:
+                if play.word in exclude:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, play)
+                elif play > best[0]:
+                    heapq.heapreplace(best, play)
+            if len(best) == k:
+                self.score_floor = best[0].score  # only plays scoring at least the k-th best can still get in
+        self.plays = sorted(best, reverse=True)
+        return self.plays
+
+
+class PlayCache:
+    """Least recently used cache of `find_all_plays` results, keyed on the board's Zobrist hash,
+    the blanks on the board and the (sorted) rack."""
+
+    def __init__(self, size: int = PLAY_CACHE_SIZE) -> None:
+        self.size    = size
+        self._plays: OrderedDict[PlayKey, list[Play]] = OrderedDict()
+        self.hits    = 0
+        self.misses  = 0
+
+    @staticmethod
+    def key(board: Board, rack, board_blanks: set[CellCoord]) -> PlayKey:
+        return (board.hash, frozenset(board_blanks), "".join(sorted(rack)))
+
+    def get(self, key: PlayKey) -> list[Play] | None:
+        """A copy of the plays cached under `key`, None if there are none."""
+        plays = self._plays.get(key)
+        if plays is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._plays.move_to_end(key)
+        return plays[:]
+
+    def put(self, key: PlayKey, plays: list[Play]) -> None:
+        self._plays[key] = plays[:]
+        self._plays.move_to_end(key)
+        if len(self._plays) > self.size:
+            self._plays.popitem(last=False)
+
+    def find_all_plays(self, dictionary: Gaddag, board: Board, rack, board_blanks: set[CellCoord],
+                       analysis: "BoardAnalysis | None" = None) -> list[Play]:
+        key   = self.key(board, rack, board_blanks)
+        plays = self.get(key)
+        if plays is None:
+            plays = GaddagSolverState(dictionary, board, rack, analysis).find_all_plays(board_blanks)
+            self.put(key, plays)
+        return plays
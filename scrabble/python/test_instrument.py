@@ -0,0 +1,118 @@
+# Instrumentation: latency buckets, the JSON lines written per turn, and that nothing is measured while it is off.
+#
+# Run from this directory: python3 -m pytest test_instrument.py
+
+import json
+import time
+
+import pytest
+
+import instrument
+import lexicon
+from board import Board
+from instrument import LatencyHistogram, TurnRecord
+from solver import GaddagSolverState
+
+WORDS  = ["AT", "CAT", "CATS", "ACT", "ACTS", "SCAT", "TA", "TAS"]
+FIELDS = {"kind", "context", "start", "latency_ms", "counters", "phases_ms"}
+
+
+@pytest.fixture(scope="module")
+def gaddag() -> lexicon.Gaddag:
+    return lexicon.Gaddag(WORDS)
+
+
+@pytest.fixture(autouse=True)
+def disabled():
+    instrument.disable()
+    yield
+    instrument.disable()
+
+
+def test_histogram_buckets():
+    histogram = LatencyHistogram(window=6)
+    for latency in (0.2, 0.5, 1.0, 1.9, 3.0, 100.0):
+        histogram.add(latency)
+    assert histogram.buckets() == {"<1ms": 2, "1-2ms": 2, "2-4ms": 1, "64-128ms": 1}
+    assert histogram.percentile(50) == 1.9
+    assert histogram.percentile(100) == 100.0
+    histogram.add(7.0)  # the window drops the oldest latency
+    assert histogram.buckets() == {"<1ms": 1, "1-2ms": 2, "2-4ms": 1, "4-8ms": 1, "64-128ms": 1}
+    assert LatencyHistogram().buckets() == {}
+
+
+def test_turns_are_written_as_json_lines(gaddag, tmp_path):
+    path = tmp_path / "turns.jsonl"
+    instrument.enable(str(path))
+    with instrument.turn("computer", rack="CATS"):
+        plays = GaddagSolverState(gaddag, Board(), list("CATS")).find_all_plays(set())
+    part = TurnRecord("share", {}, counters={"nodes": 5, "plays": 2}, phases_ms={"generation": 1.5})
+    instrument.record("player", 12.5, [part, None], rack="ACT")
+    instrument.disable()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["kind"] for line in lines] == ["computer", "player"]
+    assert all(set(line) == FIELDS for line in lines)
+    computer, player = lines
+    assert computer["context"] == {"rack": "CATS"}
+    assert computer["counters"]["plays"] == len(plays)
+    assert computer["counters"]["anchors"] > 0 and computer["counters"]["nodes"] > 0
+    assert "generation" in computer["phases_ms"] and computer["latency_ms"] >= computer["phases_ms"]["generation"]
+    assert player == {"kind": "player", "context": {"rack": "ACT"}, "start": player["start"], "latency_ms": 12.5,
+                      "counters": {"nodes": 5, "plays": 2}, "phases_ms": {"generation": 1.5}}
+
+
+def test_generator_counts_what_it_turns_down(gaddag):
+    instrument.enable()
+    with instrument.turn("computer") as record:
+        GaddagSolverState(gaddag, Board(), list("CATS")).find_all_plays(set())
+    # nothing on an empty board to turn a letter down
+    assert record.counters["lexicon_misses"] == record.counters["cross_check_misses"] == 0
+
+    board = Board()
+    for col, letter in enumerate("CAT", start=6):
+        board.set_tile((7, col), letter)
+    with instrument.turn("computer") as record:
+        plays = GaddagSolverState(gaddag, board, list("CATS")).find_all_plays(set())
+    instrument.disable()
+    assert record.counters["lexicon_misses"] > 0 and record.counters["cross_check_misses"] > 0
+    assert plays == GaddagSolverState(gaddag, board, list("CATS")).find_all_plays(set())
+
+
+def test_phases_leave_out_nested_calls():
+    class Solver:
+        def generate_at(self):
+            time.sleep(0.01)
+            self.score_play()
+
+        def score_play(self):
+            time.sleep(0.05)
+
+    instrument.enable()
+    with instrument.turn("computer") as record:
+        solver = Solver()
+        instrument.attach(solver)
+        solver.generate_at()
+    # generation is only its own 10ms, not the scoring it did inline, so the phases add up to at most the latency
+    assert 10 <= record.phases_ms["generation"] < 40
+    assert record.phases_ms["scoring"] >= 50
+    assert sum(record.phases_ms.values()) <= record.latency_ms
+    assert not record.nested
+
+
+def test_disabled_does_nothing(gaddag):
+    assert instrument.recorder() is None
+    with instrument.turn("computer") as record:
+        solver = GaddagSolverState(gaddag, Board(), list("CATS"))
+    assert record is None
+    assert not {"extend_before", "generate_at", "record_play"} & vars(solver).keys()  # no wrappers installed
+    instrument.record("player", 1.0)
+    assert instrument.recorder() is None
+    with instrument.worker_turn("share", instrumented=False) as record:
+        assert record is None
+
+    # enabled, solvers made outside a turn are not wrapped either
+    recorder = instrument.enable()
+    solver   = GaddagSolverState(gaddag, Board(), list("CATS"))
+    assert not {"extend_before", "generate_at", "record_play"} & vars(solver).keys()
+    assert not recorder.histograms
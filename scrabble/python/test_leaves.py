@@ -0,0 +1,45 @@
+# Fitting the leave table (`learn_leaves.fit`) on made-up next-turn scores, and saving and loading the table.
+#
+# Run from this directory: python3 -m pytest test_leaves.py
+
+import pytest
+
+import leaves
+from learn_leaves import fit
+
+# per leave: next-turn score total and samples; S and ES are followed by good turns, Q and V by poor ones
+SUMS    = {"S": [40.0 * 1000, 1000], "ES": [38.0 * 500, 500], "Q": [12.0 * 1000, 1000], "V": [20.0 * 40, 40], "AE": [30.0 * 5, 5]}
+AVERAGE = sum(total for total, _ in SUMS.values()) / sum(count for _, count in SUMS.values())
+
+
+@pytest.fixture(scope="module")
+def table() -> leaves.LeaveTable:
+    return fit(SUMS)
+
+
+def test_leaves_are_ordered_by_next_turn(table):
+    assert table.value("S") > table.value("ES") > table.value("V") > table.value("Q")
+    assert table.value("S") > 0 > table.value("Q")
+
+
+def test_well_sampled_leaves_keep_their_average():
+    # with a prior of one sample, a leave seen hundreds of times is worth what it was followed by, less the average
+    table = fit(SUMS, prior=1)
+    for leave, (total, count) in SUMS.items():
+        if count >= 500:
+            assert table.value(leave) == pytest.approx(total / count - AVERAGE, abs=0.1), leave
+
+
+def test_strong_prior_makes_values_add_up():
+    # with an overwhelming prior every leave, seen or not, is worth the sum of the values of its tiles
+    table = fit(SUMS, prior=10 ** 9)
+    for leave in ("ES", "AE", "SQ", "QV", "AES", "EEV", "BC", "S "):
+        assert table.value(leave) == pytest.approx(sum(table.value(tile) for tile in leave), abs=1e-3), leave
+
+
+def test_table_file_round_trip(table, tmp_path):
+    path = str(tmp_path / "test.leaves")
+    table.save(path)
+    loaded = leaves.load(path)
+    for leave in ("S", "ES", "Q", "AE", "SQ", "AEINST", " "):
+        assert loaded.value(leave) == table.value(leave), leave
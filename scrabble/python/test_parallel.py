@@ -0,0 +1,58 @@
+# Parallel move generation: the same plays as the serial generator, and solves that can be cancelled.
+#
+# Run from this directory: python3 -m pytest test_parallel.py
+
+import tempfile
+import time
+from concurrent.futures import wait
+
+import pytest
+
+import lexicon
+from engine import Game, greedy
+from parallel import ParallelSolver
+from solver import GaddagSolverState
+
+WORD_LIST  = "../dictionary/cws_6th_ed.txt"
+WORD_SHARE = 6  # every sixth word of up to eight letters, as in test_solver.py
+SEED       = 0
+MOVES      = 6
+
+
+@pytest.fixture(scope="module")
+def path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("lexicon") / "words.gaddag")
+    lexicon.Gaddag([word for word in lexicon.load_words(WORD_LIST) if len(word) <= 8][::WORD_SHARE]).save(path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def game(path) -> Game:
+    game = Game(lexicon.load_gaddag(path), SEED)
+    while not game.is_over() and len(game.moves) < MOVES:
+        game.apply(greedy(game))
+    return game
+
+
+def test_plays_match_serial_generator(path, game):
+    expected = GaddagSolverState(game.lexicon, game.board, game.rack()[:]).find_all_plays(game.blanks)
+    with ParallelSolver(path, workers=2) as solver:
+        assert solver.find_all_plays(game.board, game.rack(), game.blanks) == expected
+
+
+def test_cancelled_solve_drops_unstarted_shares(path, game, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))  # where the solve writes its position
+    expected = GaddagSolverState(game.lexicon, game.board, game.rack()[:]).find_all_plays(game.blanks)
+    with ParallelSolver(path, workers=1) as solver:
+        job = solver.submit(game.board, game.rack(), game.blanks, shares=20)
+        job.cancel()
+        wait(job.futures)
+        assert job.done()
+        assert any(future.cancelled() for future in job.futures)
+        # whatever the shares already running found are plays of the position, in their serial order
+        plays = job.plays()
+        assert len(plays) < len(expected) and plays == [play for play in expected if play in plays]
+    deadline = time.monotonic() + 5
+    while list(tmp_path.glob("*.position")) and time.monotonic() < deadline:  # the last share's callback removes it
+        time.sleep(0.01)
+    assert not list(tmp_path.glob("*.position"))
@@ -0,0 +1,49 @@
+# Simulation: telling when the leading candidate is clear of the rest, and stopping there.
+#
+# Run from this directory: python3 -m pytest test_simulate.py
+
+import pytest
+
+import lexicon
+from board import Direction, Position
+from engine import Game, greedy
+from scoring import Play
+from simulate import MIN_ITERATIONS, Candidate, Simulator, leader_is_clear
+from solver import GaddagSolverState
+
+WORD_LIST  = "../dictionary/cws_6th_ed.txt"
+WORD_SHARE = 6  # every sixth word of up to eight letters, as in test_solver.py
+SEED       = 0
+MOVES      = 4
+ITERATIONS = 400
+PLAY       = Play(10, "AT", Position(Direction.ACROSS, 7, 7), False, set())
+
+
+@pytest.fixture(scope="module")
+def path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("lexicon") / "words.gaddag")
+    lexicon.Gaddag([word for word in lexicon.load_words(WORD_LIST) if len(word) <= 8][::WORD_SHARE]).save(path)
+    return path
+
+
+def test_leader_is_clear():
+    ahead, behind = Candidate(PLAY, [30.0, 32.0] * (MIN_ITERATIONS // 2)), Candidate(PLAY, [10.0, 12.0] * (MIN_ITERATIONS // 2))
+    assert leader_is_clear([behind, ahead])
+    assert not leader_is_clear([Candidate(PLAY, ahead.equities[:-1]), behind])  # too few iterations yet
+    assert not leader_is_clear([ahead, Candidate(PLAY, [0.0, 60.0] * (MIN_ITERATIONS // 2))])  # the other could still be ahead
+
+
+def test_stops_once_leader_is_clear(path):
+    game = Game(lexicon.load_gaddag(path), SEED)
+    while not game.is_over() and len(game.moves) < MOVES:
+        game.apply(greedy(game))
+    plays = sorted(GaddagSolverState(game.lexicon, game.board, game.rack()[:]).find_all_plays(game.blanks), reverse=True)
+    best, worst = plays[0], plays[-1]
+    assert best.score - worst.score >= 20
+    position = (game.board, game.blanks, game.rack(), game.unseen())
+    with Simulator(path, workers=1) as simulator:
+        candidates = simulator.simulate(position, [worst, best], iterations=ITERATIONS, time_budget=120)
+    # a play scoring that much more wins by far, long before the iterations or the time run out
+    assert [candidate.play for candidate in candidates] == [best, worst]
+    assert all(MIN_ITERATIONS <= len(candidate.equities) < ITERATIONS for candidate in candidates)
+    assert leader_is_clear(candidates)
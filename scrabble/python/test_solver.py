@@ -0,0 +1,320 @@
+# The GADDAG generator against the original Appel-Jacobson generator (`SolverState` on a `Trie`, with
+# the cross-checks and anchors it computed square by square), on the empty board and on boards from
+# seeded self-play games, with racks holding 0, 1 and 2 blanks.
+#
+# Run from this directory: python3 -m pytest test_solver.py
+
+import math
+import random
+
+import pytest
+
+import lexicon
+import solver
+from analysis import BoardAnalysis
+from board import Board, CellCoord, Direction, Letter, Position
+from endgame import EndgameSolver
+from engine import Game, greedy
+from scoring import MAX_SCORELESS_TURNS, Play, best_scores, place, rack_value, score_raw_plays
+from solver import ALPHABET, GaddagSolverState, PlayCache, SolverState, cross_check_planes, letters_mask
+from trie import Trie
+
+WORD_LIST  = "../dictionary/cws_6th_ed.txt"
+WORD_SHARE = 6    # every sixth word of up to eight letters, so the lexicons build in a couple of seconds
+SEEDS      = range(3)
+MOVES      = (4, 10)  # positions are taken after this many moves of each game
+ENDGAME_SEEDS  = range(6)
+ENDGAME_DEPTHS = range(1, 4)  # depths each search is checked at before the exact solve
+ENDGAME_RACKS  = (slice(0, 2), slice(2, 4), slice(4, 6), slice(0, 3))  # the tiles of each rack left in endgames
+ENDGAME_FULL   = 30  # seed of a game whose endgame starts with seven tiles on both racks
+
+TestPosition = tuple[str, Board, set[CellCoord], list[Letter]]  # name, board, blanks on the board, rack
+
+
+class BaselineSolver(SolverState):
+    """`SolverState` as it was: cross-checks by trying every letter in every gap, anchors by looking at neighbours."""
+
+    def cross_check(self) -> dict[CellCoord, set[Letter]]:
+        result = {}
+        for pos in self.board.all_positions():
+            letters_before, scan_pos = "", pos
+            while self.board.is_filled(self.before_cross(scan_pos)):
+                scan_pos       = self.before_cross(scan_pos)
+                letters_before = self.board.tile(scan_pos) + letters_before
+            letters_after, scan_pos = "", pos
+            while self.board.is_filled(self.after_cross(scan_pos)):
+                scan_pos      = self.after_cross(scan_pos)
+                letters_after = letters_after + self.board.tile(scan_pos)
+            if not letters_before and not letters_after:
+                result[pos] = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+            else:
+                result[pos] = {letter for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+                               if self.dictionary.is_word(letters_before + letter + letters_after)}
+        return result
+
+    def find_anchors(self) -> list[CellCoord]:
+        if self.board.is_first_turn():
+            return [(7, 7)]
+        return [pos for pos in self.board.all_positions() if self.board.is_empty(pos) and
+                any(self.board.is_filled(near(pos)) for near in (self.before, self.after, self.before_cross, self.after_cross))]
+
+
+@pytest.fixture(scope="module")
+def words() -> list[str]:
+    return [word for word in lexicon.load_words(WORD_LIST) if len(word) <= 8][::WORD_SHARE]
+
+
+@pytest.fixture(scope="module")
+def gaddag(words) -> lexicon.Gaddag:
+    return lexicon.Gaddag(words)
+
+
+@pytest.fixture(scope="module")
+def trie(words) -> Trie:
+    return Trie(words)
+
+
+@pytest.fixture(scope="module")
+def positions(gaddag) -> list[TestPosition]:
+    boards: list[TestPosition] = [("empty", Board(), set(), list("RETAINS"))]
+    for seed in SEEDS:
+        game = Game(gaddag, seed)
+        for moves in MOVES:
+            while not game.is_over() and len(game.moves) < moves:
+                game.apply(greedy(game))
+            boards.append((f"seed {seed} after {len(game.moves)} moves", game.board.copy(), set(game.blanks), game.rack()[:]))
+    racks = []
+    for name, board, blanks, rack in boards:
+        rack = ["E" if tile == " " else tile for tile in rack]
+        racks += [(f"{name}, {count} blanks", board, blanks, rack[:len(rack) - count] + [" "] * count) for count in range(3)]
+    return racks
+
+
+def raw_plays(plays) -> set[tuple[Position, str, frozenset[CellCoord]]]:
+    return {(pos, letters, frozenset(blanks)) for pos, letters, blanks in plays}
+
+
+def test_raw_plays_match_baseline(gaddag, trie, positions):
+    for name, board, _, rack in positions:
+        expected = raw_plays(BaselineSolver(trie, board, rack[:]).find_all_options())
+        assert raw_plays(GaddagSolverState(gaddag, board, rack[:]).find_all_options()) == expected, name
+
+
+def test_scored_plays_match_baseline(gaddag, trie, positions):
+    # the baseline fixes one placement of the blanks per play, so it is scored for every placement
+    for name, board, blanks, rack in positions:
+        expected = best_scores(score_raw_plays(trie, board, BaselineSolver(trie, board, rack[:]).find_all_options(), blanks))
+        assert best_scores(GaddagSolverState(gaddag, board, rack[:]).find_all_plays(blanks)) == expected, name
+
+
+def test_analysis_and_top_k_agree(gaddag, positions):
+    for name, board, blanks, rack in positions:
+        plays    = sorted(GaddagSolverState(gaddag, board, rack[:]).find_all_plays(blanks), reverse=True)
+        analysis = BoardAnalysis(gaddag, board, blanks)
+        assert sorted(GaddagSolverState(gaddag, board, rack[:], analysis).find_all_plays(blanks), reverse=True) == plays, name
+        assert [play.score for play in GaddagSolverState(gaddag, board, rack[:]).find_top_k(5, blanks)] == \
+               [play.score for play in plays[:5]], name
+
+
+def test_cross_check_planes_once_per_board(gaddag, positions, monkeypatch):
+    calls = []
+
+    def counted(*args):
+        calls.append(args)
+        return cross_check_planes(*args)
+
+    monkeypatch.setattr(solver, "cross_check_planes", counted)
+    name, board, blanks, rack = positions[-1]
+    state = GaddagSolverState(gaddag, board.copy(), rack[:])
+    plays = state.find_all_plays(blanks)
+    assert len(calls) == 1, name  # both directions read the same planes
+    place(state.board, plays[0], blanks)
+    state.cross_check_masks()
+    assert len(calls) == 2, name  # a new board version is worked out again
+
+
+def test_streamed_plays_match_find_all_plays(gaddag, positions):
+    top = {(row, col) for row in range(8) for col in range(15)}
+    for name, board, blanks, rack in positions[::2]:  # still every blank count, in half the time
+        plays = sorted(GaddagSolverState(gaddag, board, rack[:]).find_all_plays(blanks))
+
+        def stream(**filters) -> list[Play]:
+            return sorted(GaddagSolverState(gaddag, board, rack[:]).iter_plays(blanks, **filters))
+
+        assert stream() == plays, name
+        min_score = plays[len(plays) // 2].score if plays else 0
+        assert stream(min_score=min_score) == [play for play in plays if play.score >= min_score], name
+        for direction in Direction:
+            assert stream(directions=[direction]) == [play for play in plays if play.pos.dir == direction], name
+        exclude = {play.word for play in plays[::3]}
+        assert stream(exclude=exclude) == [play for play in plays if play.word not in exclude], name
+        # every play comes from exactly one anchor, so the two halves of the board share them out
+        assert sorted(stream(region=top) + stream(region=set(board.all_positions()) - top)) == plays, name
+
+
+def test_tiles_placed_matches_fresh_analysis(gaddag):
+    for seed in SEEDS:
+        game = Game(gaddag, seed)
+        while not game.is_over() and len(game.moves) < MOVES[-1]:
+            game.apply(greedy(game))
+            fresh = BoardAnalysis(gaddag, game.board, game.blanks)
+            name  = f"seed {seed} after {len(game.moves)} moves"
+            assert game.analysis.cross_masks == fresh.cross_masks, name
+            assert game.analysis.cross_scores == fresh.cross_scores, name
+            assert game.analysis.anchor_list() == fresh.anchor_list(), name
+
+
+def test_hook_masks_match_word_checks(words, gaddag, trie):
+    dawg = lexicon.Dawg(words)
+    for word, other in zip(words[::40], words[17::40]):
+        # gaps of a word, and gaps between fragments of two words, which mostly fit no letter
+        for before, after in [(word[:i], word[i + 1:]) for i in range(len(word))] + [(word[:3], other[-2:]), (other[:1], "")]:
+            expected = letters_mask(letter for letter in ALPHABET if trie.is_word(before + letter + after))
+            assert gaddag.hook_mask(before, after) == expected, (before, after)
+            assert dawg.hook_mask(before, after) == expected, (before, after)
+
+
+def test_hook_letters_fit_both_directions(gaddag, trie, positions):
+    for name, board, blanks, rack in positions[::3]:
+        baseline = BaselineSolver(trie, board, rack[:])
+        fits     = []
+        for direction in Direction:
+            baseline.direction = direction
+            fits.append(baseline.cross_check())
+        analysis = BoardAnalysis(gaddag, board, blanks)
+        assert analysis.hook_letters() == {pos: fits[0][pos] & fits[1][pos] for pos in analysis.anchors}, name
+        assert analysis.hook_letters(rack) == {pos: fits[0][pos] & fits[1][pos] & set(rack) for pos in analysis.anchors}, name
+
+
+def test_undo_restores_board(gaddag, positions):
+    for name, board, blanks, rack in positions:
+        board = board.copy()
+        plays = GaddagSolverState(gaddag, board, rack[:]).find_top_k(3, blanks)
+        for play in plays:
+            before, checkpoint = (str(board), board.hash, board.row_bits[:], board.col_bits[:]), board.checkpoint()
+            place(board, play, blanks)
+            assert board.hash != before[1], name
+            board.undo(checkpoint)
+            assert (str(board), board.hash, board.row_bits, board.col_bits) == before, name
+        if plays:
+            place(board, plays[0], blanks)
+            board.commit()
+            assert board.checkpoint() == 0, name
+
+
+def test_hash_ignores_move_order(positions):
+    for name, board, _, _ in positions:
+        tiles  = [(pos, board.tile(pos)) for pos in board.filled_positions()]
+        boards = [Board(), Board()]
+        for pos, tile in tiles:
+            boards[0].set_tile(pos, tile)
+        for pos, tile in reversed(tiles):
+            boards[1].set_tile(pos, tile)
+        assert boards[0].hash == boards[1].hash == board.hash, name
+        if tiles:
+            boards[1].set_tile(tiles[0][0], "Z" if tiles[0][1] != "Z" else "Q")
+            assert boards[1].hash != board.hash, name
+
+
+def test_play_cache_keys_on_blanks(gaddag, positions):
+    for name, board, blanks, rack in positions[3:]:
+        cache    = PlayCache()
+        row, col = board.filled_positions()[0]
+        other    = blanks ^ {(14 - row, col)}  # the same tiles, with one of them played as a blank or not
+        plays    = cache.find_all_plays(gaddag, board, rack[:], blanks)
+        assert cache.find_all_plays(gaddag, board, rack[:], other) == GaddagSolverState(gaddag, board, rack[:]).find_all_plays(other), name
+        assert (cache.hits, cache.misses) == (0, 2), name
+        assert cache.find_all_plays(gaddag, board, rack[:], blanks) == plays, name
+        assert (cache.hits, cache.misses) == (1, 2), name
+
+
+def minimax(game: Game, depth: float, known: dict[tuple[object, ...], int]) -> int:
+    """Spread the player to move gets from here on, by trying every line `depth` plies deep and judging the racks
+    left after that; positions are remembered by their full contents rather than a hash, and there are no bounds."""
+    rack, other = game.rack(), game.racks[1 - game.turn]
+    if not other:
+        return -2 * rack_value(rack)
+    if game.scoreless_turns >= MAX_SCORELESS_TURNS:
+        return 0
+    if depth == 0:
+        return rack_value(other) - rack_value(rack)
+    key = (tuple(map(game.board.tile, game.board.all_positions())), frozenset(game.blanks), tuple(sorted(rack)),
+           tuple(sorted(other)), game.turn, game.scoreless_turns, depth)
+    if key not in known:
+        values = []
+        for play in [*game.solver().find_all_plays(game.blanks), None]:
+            child                 = Game.from_position(game.analysis, game.blanks, game.racks, game.bag, game.rng, game.turn)
+            child.scoreless_turns = game.scoreless_turns
+            child.apply(play)
+            values.append((play.score if play else 0) - minimax(child, depth - 1, known))
+        known[key] = max(values)
+    return known[key]
+
+
+def test_endgame_matches_minimax(gaddag):
+    # endgames with a couple of tiles per rack, so every line can be tried; the solver's transposition table
+    # and its shortcut at depth 1 must not change the value, neither at each depth nor once the search is exact
+    for seed in ENDGAME_SEEDS:
+        game = Game(gaddag, seed)
+        while not game.is_over() and game.bag:
+            game.apply(greedy(game))
+        for tiles in ENDGAME_RACKS:
+            racks    = [rack[tiles] for rack in game.racks]
+            position = Game.from_position(game.analysis, game.blanks, racks, [], random.Random(seed), game.turn)
+            if position.is_over():
+                continue
+            solver, known = EndgameSolver(gaddag, position.board, position.blanks, racks, position.turn), {}
+            for depth in ENDGAME_DEPTHS:
+                assert solver.search(depth, -math.inf, math.inf)[0] == minimax(position, depth, known), (seed, racks, depth)
+            solution = solver.solve()
+            assert solution.exact, (seed, racks)
+            assert solution.value == minimax(position, math.inf, known), (seed, racks)
+
+
+def test_endgame_moves_match_fresh_generation(gaddag):
+    # the solver keeps the plays of the last board each rack was searched on outside the lines that changed;
+    # walking randomly through the tree, each position's plays must be the ones a fresh search finds
+    for seed in ENDGAME_SEEDS[:2]:
+        game = Game(gaddag, seed)
+        while not game.is_over() and game.bag:
+            game.apply(greedy(game))
+        solver, rng = EndgameSolver(gaddag, game.board, game.blanks, game.racks, game.turn), random.Random(seed)
+        for _ in range(20):
+            undos = []
+            for _ in range(rng.randint(1, 4)):
+                moves = solver.moves()
+                fresh = GaddagSolverState(gaddag, solver.board, solver.racks[solver.turn], solver.analysis).find_all_plays(solver.blanks)
+                assert sorted(play for play in moves if play is not None) == sorted(fresh), seed
+                undos.append(solver.make(rng.choice(moves)))
+            for undo in reversed(undos):
+                solver.unmake(undo)
+
+
+def test_endgame_solves_full_racks(gaddag):
+    game = Game(gaddag, ENDGAME_FULL)
+    while not game.is_over() and game.bag:
+        game.apply(greedy(game))
+    assert [len(rack) for rack in game.racks] == [7, 7]
+    solution = EndgameSolver(gaddag, game.board, game.blanks, game.racks, game.turn, game.scoreless_turns, game.analysis).solve()
+    assert solution.exact
+    # the line found, played out to the end of the game, gets the spread it was valued at
+    player, before = game.turn, game.scores[:]
+    for play in solution.moves:
+        game.apply(play)
+    game.finish()
+    assert game.is_over()
+    assert (game.scores[player] - before[player]) - (game.scores[1 - player] - before[1 - player]) == solution.value
+
+
+def test_endgame_skips_excluded_words(gaddag):
+    for seed in ENDGAME_SEEDS:
+        game = Game(gaddag, seed)
+        while not game.is_over() and game.bag:
+            game.apply(greedy(game))
+        racks = [rack[ENDGAME_RACKS[-1]] for rack in game.racks]
+        first = EndgameSolver(gaddag, game.board, game.blanks, racks, game.turn).solve().moves
+        if not first or first[0] is None:
+            continue
+        # the player to move gives up the best finish and every other play of that word, all along the line
+        solution = EndgameSolver(gaddag, game.board, game.blanks, racks, game.turn, exclude={first[0].word}).solve()
+        assert all(play is None or play.word != first[0].word for play in solution.moves[::2]), seed
@@ -0,0 +1,44 @@
+# Tournaments: the CSV of games and the summary per pairing.
+#
+# Run from this directory: python3 -m pytest test_tournament.py
+
+import csv
+
+import pytest
+
+import lexicon
+from engine import BOTS, play_game
+from tournament import CSV_COLUMNS, run_tournament, write_summary
+
+WORD_LIST  = "../dictionary/cws_6th_ed.txt"
+WORD_SHARE = 6  # every sixth word of up to eight letters, as in test_solver.py
+NAMES      = ["greedy", "skip_known"]
+GAMES      = 4
+
+
+@pytest.fixture(scope="module")
+def path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("lexicon") / "words.gaddag")
+    lexicon.Gaddag([word for word in lexicon.load_words(WORD_LIST) if len(word) <= 8][::WORD_SHARE]).save(path)
+    return path
+
+
+def test_two_bots_write_one_row_per_game(path, tmp_path):
+    out       = tmp_path / "tournament.csv"
+    summaries = run_tournament(path, NAMES, GAMES, str(out), seed=10, workers=2)
+    with open(out, newline="") as file:
+        header, *rows = list(csv.reader(file))
+    assert header == CSV_COLUMNS
+    assert sorted(int(row[2]) for row in rows) == list(range(10, 10 + GAMES))
+    # the games are the ones `play_game` plays on the same seeds, whichever worker played them
+    gaddag = lexicon.load_gaddag(path)
+    for bot0, bot1, seed, first, score0, score1, turns in rows:
+        result = play_game(gaddag, [BOTS[bot0], BOTS[bot1]], int(seed), int(first))
+        assert [bot0, bot1] == NAMES and int(first) == int(seed) % 2
+        assert (result.scores, result.turns) == ((int(score0), int(score1)), int(turns)), seed
+
+    summary = tmp_path / "summary.csv"
+    write_summary(summaries, str(summary))
+    with open(summary, newline="") as file:
+        _, row = list(csv.reader(file))
+    assert row[:3] == [*NAMES, str(GAMES)]
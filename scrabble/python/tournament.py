@@ -0,0 +1,102 @@
+# Round-robin tournaments between the bots of `engine`, spread over worker processes.
+#
+# Every pair of strategies plays the same seeded deals (the first player alternating from game to
+# game), so differences between pairs come from the strategies rather than the tiles. Games are
+# sent to the workers in batches and every finished batch is appended to the CSV straight away.
+
+import argparse
+import csv
+import itertools as it
+import os
+import time
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import lexicon
+from engine import BOTS, GameResult, Summary, play_game
+
+BATCH_SIZE  = 25
+CSV_COLUMNS = ["bot0", "bot1", "seed", "first", "score0", "score1", "turns"]
+
+Pairing = tuple[str, str]
+
+
+def _play_batch(pairing: Pairing, seeds: Sequence[int]) -> tuple[Pairing, list[GameResult]]:
+    bots = [BOTS[name] for name in pairing]
+    return pairing, [play_game(lexicon.attached(), bots, seed, seed % 2) for seed in seeds]
+
+
+def pairings(names: Sequence[str]) -> list[Pairing]:
+    """Every strategy against every other one, once."""
+    return list(it.combinations(names, 2))
+
+
+def run_tournament(path: str, names: Sequence[str], games: int, out: str, seed: int = 0,
+                   workers: int | None = None) -> dict[Pairing, Summary]:
+    """Plays `games` games per pairing of `names` on the GADDAG at `path`, writing one CSV row per game to `out`.
+
+    Game i of every pairing uses seed `seed + i`. At most two batches per worker are in flight,
+    so memory use does not grow with the number of games."""
+    workers   = workers or os.cpu_count() or 1
+    summaries = {pairing: Summary() for pairing in pairings(names)}
+    batches   = ((pairing, range(start, min(start + BATCH_SIZE, seed + games)))
+                 for pairing in summaries for start in range(seed, seed + games, BATCH_SIZE))
+
+    with open(out, "w", newline="") as file, ProcessPoolExecutor(workers, initializer=lexicon.attach, initargs=(path,)) as executor:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        pending = {executor.submit(_play_batch, *batch) for batch in it.islice(batches, 2 * workers)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pairing, results = future.result()
+                for result in results:
+                    summaries[pairing].add(result)
+                    writer.writerow([*pairing, result.seed, result.first, *result.scores, result.turns])
+                file.flush()
+                pending |= {executor.submit(_play_batch, *batch) for batch in it.islice(batches, 1)}
+    return summaries
+
+
+def write_summary(summaries: dict[Pairing, Summary], path: str) -> None:
+    """One row per pairing with win rates, mean spread and their 95% confidence intervals."""
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["bot0", "bot1", "games", "ties", "win_rate0", "win_rate0_low", "win_rate0_high",
+                         "spread", "spread_low", "spread_high"])
+        for pairing, summary in summaries.items():
+            spreads   = summary.spreads()
+            if not spreads:
+                continue
+            low, high = summary.win_rate_interval(0)
+            writer.writerow([*pairing, len(spreads), summary.ties(), f"{summary.win_rate(0):.4f}", f"{low:.4f}", f"{high:.4f}",
+                             f"{sum(spreads) / len(spreads):.2f}", *(f"{bound:.2f}" for bound in summary.spread_interval())])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Round-robin tournament between bots, over all cores")
+    parser.add_argument("bots", nargs="+", choices=sorted(BOTS))
+    parser.add_argument("--games", type=int, default=1000, help="games per pairing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--lexicon", help="compiled GADDAG to use instead of NWL2020")
+    parser.add_argument("--out", default="tournament.csv")
+    args = parser.parse_args()
+    if len(args.bots) < 2:
+        parser.error("a tournament needs at least two bots")
+
+    path      = args.lexicon or lexicon.nwl_2020(gaddag=True).path
+    assert path is not None  # a loaded lexicon knows its file
+    start     = time.perf_counter()
+    summaries = run_tournament(path, args.bots, args.games, args.out, args.seed, args.workers)
+    elapsed   = time.perf_counter() - start
+    write_summary(summaries, os.path.splitext(args.out)[0] + "_summary.csv")
+    for pairing, summary in summaries.items():
+        print(f"== {pairing[0]} vs {pairing[1]}")
+        print(summary.report(pairing))
+    total = args.games * len(summaries)
+    print(f"{total} games in {elapsed:.1f}s, {total / elapsed * 60:.0f} games per minute")
+
+
+if __name__ == "__main__":
+    main()
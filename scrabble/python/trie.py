@@ -29,11 +29,3 @@ class Trie:
         if word_node is None:
             return False
         return word_node.is_word
-
-def nwl_2020():
-    with open("../dictionary/nwl_2020.txt") as file:
-        words = []
-        for line in file:
-            word = line.strip().split()[0]
-            words.append(word)
-    return Trie(words)